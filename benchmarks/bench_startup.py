@@ -0,0 +1,98 @@
+"""
+Report the import time of the worker and check that the vanilla LLM path does
+not import the topic modeling stack.
+
+The entry points used by handler.py, then handler.py itself with warm-up off
+and on, are imported in a fresh interpreter with -X importtime (the worker
+loop is not started). The slowest packages are listed and the run fails if
+any of HEAVY_MODULES was imported without warm-up.
+
+Usage:
+    python benchmarks/bench_startup.py [--top N]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from typing import Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the clustering branch may import these
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "umap",
+    "hdbscan",
+    "bertopic",
+    "sklearn",
+    "pandas",
+]
+
+VANILLA_PATH_IMPORT = "from utils import get_views_aspects, get_views_aspects_fallback"
+# handler.py starts the worker loop on import, so start is replaced by a no-op
+HANDLER_IMPORT = "import runpod.serverless; runpod.serverless.start = lambda config: None; import handler"
+
+# (label, statement, extra environment, whether HEAVY_MODULES are allowed)
+SCENARIOS = [
+    ("vanilla path", VANILLA_PATH_IMPORT, {}, False),
+    ("handler.py, WARMUP_ENABLED=false", HANDLER_IMPORT, {"WARMUP_ENABLED": "false"}, False),
+    ("handler.py, WARMUP_ENABLED=true", HANDLER_IMPORT, {"WARMUP_ENABLED": "true"}, True),
+]
+
+
+def import_times(statement: str, env: Optional[Dict[str, str]] = None):
+    """
+    Run statement with -X importtime and return (module, self_us, cumulative_us) rows.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=15, help="number of packages listed")
+    args = parser.parse_args()
+
+    failed = False
+    for label, statement, env, heavy_allowed in SCENARIOS:
+        rows = import_times(statement, env)
+        # Top-level imports are the least indented; their cumulative times add up to the total
+        top_level = [cumulative for module, _, cumulative in rows if not module.startswith("  ")]
+        total_ms = sum(top_level) / 1000
+        # Cumulative time of each package, measured where it was first imported
+        packages = {module.strip(): cumulative for module, _, cumulative in rows if "." not in module}
+
+        print(f"Import time of {label}: {total_ms:.0f} ms ({len(rows)} modules)")
+        print(f"{'cumulative ms':>14}  package")
+        for package, cumulative in sorted(packages.items(), key=lambda row: -row[1])[: args.top]:
+            print(f"{cumulative / 1000:>14.1f}  {package}")
+
+        imported = {module.strip().split(".")[0] for module, _, _ in rows}
+        heavy = [module for module in HEAVY_MODULES if module in imported]
+        if heavy and not heavy_allowed:
+            print(f"FAIL: {label} imports {', '.join(heavy)}")
+            failed = True
+        elif not heavy_allowed:
+            print(f"OK: {label} imports none of " + ", ".join(HEAVY_MODULES))
+        print()
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
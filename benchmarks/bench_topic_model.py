@@ -0,0 +1,76 @@
+"""
+Benchmark the full and lean topic modeling modes on synthetic segment sets.
+
+The full mode computes the document x topic probability matrix and the topic
+hierarchy; the lean mode (used by get_views_aspects) only fits topics.
+Embeddings are generated synthetically so that only the topic modeling itself
+is measured.
+
+Usage:
+    python benchmarks/bench_topic_model.py [n_docs ...]
+"""
+
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.topic_modeling import initialize_topic_model, run_topic_model_hierarchical  # noqa: E402
+
+N_CLUSTERS = 40
+EMBEDDING_DIM = 384
+
+
+def make_corpus(n_docs: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+    shared_vocabulary = [f"shared{i}" for i in range(200)]
+    vocabularies = [[f"topic{c}word{i}" for i in range(30)] for c in range(N_CLUSTERS)]
+    centers = rng.normal(size=(N_CLUSTERS, EMBEDDING_DIM))
+
+    clusters = rng.integers(0, N_CLUSTERS, size=n_docs)
+    docs = [
+        " ".join(
+            random.choices(vocabularies[c], k=random.randint(5, 20))
+            + random.choices(shared_vocabulary, k=random.randint(3, 10))
+        )
+        for c in clusters
+    ]
+    embeddings = centers[clusters] + rng.normal(scale=0.3, size=(n_docs, EMBEDDING_DIM))
+    return docs, embeddings.astype(np.float32)
+
+
+def run(docs, embeddings, lean: bool):
+    tracemalloc.start()
+    start = time.perf_counter()
+    topic_model = initialize_topic_model(calculate_probabilities=not lean)
+    run_topic_model_hierarchical(
+        topic_model, docs, embeddings=embeddings, compute_hierarchy=not lean
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, len(set(topic_model.topics_))
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2000, 10000, 30000]
+    # Warm up the numba kernels so the first measurement is not dominated by JIT compilation
+    run(*make_corpus(500), lean=True)
+
+    print(f"{'docs':>8} {'mode':>6} {'seconds':>9} {'peak MiB':>9} {'topics':>7}")
+    for n_docs in sizes:
+        docs, embeddings = make_corpus(n_docs)
+        for lean in (False, True):
+            elapsed, peak, n_topics = run(docs, embeddings, lean)
+            mode = "lean" if lean else "full"
+            print(f"{n_docs:>8} {mode:>6} {elapsed:>9.2f} {peak:>9.1f} {n_topics:>7}")
+
+
+if __name__ == "__main__":
+    main()
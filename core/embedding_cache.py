@@ -0,0 +1,169 @@
+import os
+import re
+import fcntl
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Callable, Iterator, Optional
+
+import numpy as np
+from runpod import RunPodLogger
+from utils.helpers import default_storage_path
+
+logger = RunPodLogger()
+
+# Maximum number of parameters in a single SQLite IN (...) lookup
+_LOOKUP_BATCH_SIZE = 500
+
+
+def hash_text(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store of document embeddings.
+
+    Embeddings are appended as float16 rows to a flat file that is read through
+    a memory map; a SQLite index maps the SHA-1 of each text to its row. The
+    store is namespaced by embedding model and safe to share between threads and
+    between processes on the same volume (appends take a file lock).
+
+    Args:
+        directory: Root directory of the cache
+        model_name: Name of the embedding model, used as namespace
+        dim: Embedding dimension
+    """
+
+    def __init__(self, directory: str, model_name: str, dim: int):
+        self.dim = dim
+        self.path = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self._matrix_path = os.path.join(self.path, "embeddings.f16")
+        self._lock_path = os.path.join(self.path, "cache.lock")
+        self._index_path = os.path.join(self.path, "index.sqlite")
+        self._row_bytes = dim * np.dtype(np.float16).itemsize
+        self._thread_lock = threading.Lock()
+
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_index (hash BLOB PRIMARY KEY, row INTEGER)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self._index_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        with self._thread_lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, hashes: List[bytes]) -> Dict[bytes, int]:
+        rows: Dict[bytes, int] = {}
+        with self._connect() as connection:
+            for start in range(0, len(hashes), _LOOKUP_BATCH_SIZE):
+                batch = hashes[start : start + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows.update(
+                    connection.execute(
+                        f"SELECT hash, row FROM embedding_index WHERE hash IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+        return rows
+
+    def _append(self, hashes: List[bytes], embeddings: np.ndarray) -> Dict[bytes, int]:
+        with self._write_lock():
+            # Another worker may have stored some of these in the meantime
+            rows = self._lookup(hashes)
+            missing = [i for i, h in enumerate(hashes) if h not in rows]
+            if not missing:
+                return rows
+
+            size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+            first_row = size // self._row_bytes
+            with open(self._matrix_path, "ab") as matrix_file:
+                # Truncate a partially written row left behind by an interrupted append
+                matrix_file.truncate(first_row * self._row_bytes)
+                matrix_file.write(embeddings[missing].astype(np.float16).tobytes())
+
+            new_rows = {hashes[i]: first_row + offset for offset, i in enumerate(missing)}
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO embedding_index (hash, row) VALUES (?, ?)",
+                    list(new_rows.items()),
+                )
+            rows.update(new_rows)
+            return rows
+
+    def _read(self, rows: List[int]) -> np.ndarray:
+        n_rows = os.path.getsize(self._matrix_path) // self._row_bytes
+        matrix = np.memmap(self._matrix_path, dtype=np.float16, mode="r", shape=(n_rows, self.dim))
+        return np.asarray(matrix[rows], dtype=np.float32)
+
+    def get_or_compute(
+        self, docs: List[str], embed: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Return embeddings for docs, computing only those not in the cache yet.
+
+        Args:
+            docs: Documents to embed
+            embed: Function embedding a list of texts into a (n, dim) array
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per document in input order
+        """
+        hashes = [hash_text(doc) for doc in docs]
+        rows = self._lookup(list(set(hashes)))
+
+        missing_hashes: Dict[bytes, str] = {}
+        for h, doc in zip(hashes, docs):
+            if h not in rows and h not in missing_hashes:
+                missing_hashes[h] = doc
+        logger.info(
+            f"Embedding cache: {len(docs) - len(missing_hashes)} hits, "
+            f"{len(missing_hashes)} new documents to embed"
+        )
+
+        if missing_hashes:
+            new_embeddings = np.asarray(embed(list(missing_hashes.values())))
+            rows.update(self._append(list(missing_hashes.keys()), new_embeddings))
+
+        return self._read([rows[h] for h in hashes])
+
+
+_embedding_caches: Dict[str, EmbeddingCache] = {}
+_embedding_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, dim: int) -> Optional[EmbeddingCache]:
+    """
+    Return the shared EmbeddingCache for a model, or None if caching is disabled.
+
+    The cache lives in EMBEDDING_CACHE_DIR (default: the RunPod network volume if
+    mounted, else ~/.cache) and can be turned off with EMBEDDING_CACHE_ENABLED=false.
+    """
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    with _embedding_caches_lock:
+        if model_name not in _embedding_caches:
+            directory = os.getenv("EMBEDDING_CACHE_DIR") or default_storage_path("embedding_cache")
+            try:
+                _embedding_caches[model_name] = EmbeddingCache(directory, model_name, dim)
+            except OSError as e:
+                logger.error(f"Embedding cache unavailable at {directory}: {e}")
+                return None
+        return _embedding_caches[model_name]
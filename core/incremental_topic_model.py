@@ -0,0 +1,205 @@
+import os
+import json
+import uuid
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Iterator, Optional
+
+import numpy as np
+from runpod import RunPodLogger
+from bertopic import BERTopic
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.helpers import default_storage_path
+from core.embedding_cache import hash_text
+from core.topic_modeling import (
+    get_embedding_model,
+    initialize_topic_model,
+    run_topic_model_hierarchical,
+)
+
+logger = RunPodLogger()
+
+# Refit when more than this fraction of the run's documents is new to the stored model
+TOPIC_MODEL_MAX_NEW_FRACTION = float(os.getenv("TOPIC_MODEL_MAX_NEW_FRACTION", 0.5))
+# Refit when more than this fraction of the run's documents matches no stored topic
+TOPIC_MODEL_DRIFT_THRESHOLD = float(os.getenv("TOPIC_MODEL_DRIFT_THRESHOLD", 0.1))
+# Minimum cosine similarity between a new document and a topic to be assigned to it
+TOPIC_MODEL_MIN_SIMILARITY = float(os.getenv("TOPIC_MODEL_MIN_SIMILARITY", 0.4))
+
+_CURRENT_FILE = "current"
+_ASSIGNMENTS_FILE = "assignments.json"
+
+_project_locks: Dict[str, threading.Lock] = {}
+_project_locks_lock = threading.Lock()
+
+
+def _project_dir(project_id: str) -> str:
+    store_dir = os.getenv("TOPIC_MODEL_STORE_DIR") or default_storage_path("topic_models")
+    return os.path.join(store_dir, str(project_id).replace(os.sep, "_"))
+
+
+@contextmanager
+def _project_lock(project_id: str) -> Iterator[None]:
+    with _project_locks_lock:
+        thread_lock = _project_locks.setdefault(project_id, threading.Lock())
+    project_dir = _project_dir(project_id)
+    os.makedirs(project_dir, exist_ok=True)
+    with thread_lock, open(os.path.join(project_dir, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_json_atomic(path: str, data) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _load(project_id: str) -> Optional[Tuple[BERTopic, Dict[str, int], str]]:
+    project_dir = _project_dir(project_id)
+    current_path = os.path.join(project_dir, _CURRENT_FILE)
+    if not os.path.exists(current_path):
+        return None
+    with open(current_path) as f:
+        model_dir = os.path.join(project_dir, f.read().strip())
+    topic_model = BERTopic.load(model_dir, embedding_model=get_embedding_model())
+    with open(os.path.join(model_dir, _ASSIGNMENTS_FILE)) as f:
+        assignments = json.load(f)
+    return topic_model, assignments, model_dir
+
+
+def _save(project_id: str, topic_model: BERTopic, assignments: Dict[str, int]) -> None:
+    project_dir = _project_dir(project_id)
+    model_name = f"model-{uuid.uuid4().hex}"
+    model_dir = os.path.join(project_dir, model_name)
+    # CountVectorizer stores numpy int64 indices, which the c-TF-IDF config cannot json-dump
+    vectorizer_model = topic_model.vectorizer_model
+    vectorizer_model.vocabulary_ = {
+        word: int(index) for word, index in vectorizer_model.vocabulary_.items()
+    }
+    try:
+        topic_model.save(
+            model_dir,
+            serialization="safetensors",
+            save_ctfidf=True,
+            save_embedding_model=False,
+        )
+        _write_json_atomic(os.path.join(model_dir, _ASSIGNMENTS_FILE), assignments)
+    except BaseException:
+        shutil.rmtree(model_dir, ignore_errors=True)
+        raise
+
+    # Switch the pointer atomically, then remove the previous versions
+    current_path = os.path.join(project_dir, _CURRENT_FILE)
+    tmp_path = f"{current_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(model_name)
+    os.replace(tmp_path, current_path)
+    for entry in os.listdir(project_dir):
+        if entry.startswith("model-") and entry != model_name:
+            shutil.rmtree(os.path.join(project_dir, entry), ignore_errors=True)
+
+
+def _refit(
+    project_id: Optional[str], docs: List[str], embeddings: np.ndarray, hashes: List[str]
+) -> Tuple[BERTopic, List[int]]:
+    topic_model = initialize_topic_model(calculate_probabilities=False)
+    run_topic_model_hierarchical(topic_model, docs, embeddings=embeddings, compute_hierarchy=False)
+    topics = [int(topic) for topic in topic_model.topics_]
+    if project_id is not None:
+        try:
+            _save(project_id, topic_model, dict(zip(hashes, topics)))
+        except Exception as e:
+            logger.error(f"Failed to persist topic model for project {project_id}: {e}")
+    return topic_model, topics
+
+
+def _assign_to_topics(
+    topic_model: BERTopic, embeddings: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assign embeddings to the closest non-outlier topic by cosine similarity.
+
+    When the model has no topic besides the outlier topic, every embedding is
+    assigned to -1 with a similarity of 0, so the caller's drift check refits.
+    """
+    # Rows of topic_embeddings_ follow the sorted topic labels
+    labels = np.array(sorted(topic_model.topic_representations_.keys()))
+    topic_embeddings = np.asarray(topic_model.topic_embeddings_)[labels != -1]
+    labels = labels[labels != -1]
+    if len(labels) == 0:
+        return np.full(len(embeddings), -1), np.zeros(len(embeddings))
+    similarity = cosine_similarity(embeddings, topic_embeddings)
+    best = similarity.argmax(axis=1)
+    return labels[best], similarity[np.arange(len(best)), best]
+
+
+def fit_project_topic_model(
+    project_id: Optional[str], docs: List[str], embeddings: np.ndarray
+) -> Tuple[BERTopic, List[int]]:
+    """
+    Fit topics for a run, reusing the project's persisted topic model when possible.
+
+    Documents already seen by the stored model keep their topic. New documents
+    are assigned to the closest stored topic by embedding similarity, which
+    turns a full UMAP + HDBSCAN refit into O(new documents) work. A full refit
+    (whose result replaces the stored model) happens when there is no stored
+    model, when more than TOPIC_MODEL_MAX_NEW_FRACTION of the documents are new,
+    or when more than TOPIC_MODEL_DRIFT_THRESHOLD of them match no stored topic.
+
+    Args:
+        project_id: Project the documents belong to; None disables persistence
+        docs: Documents of the run
+        embeddings: Embeddings of docs
+
+    Returns:
+        Tuple[BERTopic, List[int]]: Topic model and topic assignment per document
+    """
+    hashes = [hash_text(doc).hex() for doc in docs]
+    if project_id is None or os.getenv("INCREMENTAL_TOPIC_MODEL", "true").lower() != "true":
+        return _refit(None, docs, embeddings, hashes)
+
+    with _project_lock(project_id):
+        try:
+            stored = _load(project_id)
+        except Exception as e:
+            logger.error(f"Failed to load topic model for project {project_id}: {e}")
+            stored = None
+        if stored is None:
+            logger.info(f"No stored topic model for project {project_id}, fitting from scratch")
+            return _refit(project_id, docs, embeddings, hashes)
+
+        topic_model, assignments, model_dir = stored
+        new_indices = [i for i, h in enumerate(hashes) if h not in assignments]
+        if len(new_indices) > TOPIC_MODEL_MAX_NEW_FRACTION * len(docs):
+            logger.info(
+                f"{len(new_indices)}/{len(docs)} new documents for project {project_id}, refitting"
+            )
+            return _refit(project_id, docs, embeddings, hashes)
+
+        if new_indices:
+            predictions, similarities = _assign_to_topics(topic_model, embeddings[new_indices])
+            unmatched = similarities < TOPIC_MODEL_MIN_SIMILARITY
+            if unmatched.sum() > TOPIC_MODEL_DRIFT_THRESHOLD * len(docs):
+                logger.info(
+                    f"{int(unmatched.sum())}/{len(docs)} documents match no stored topic "
+                    f"for project {project_id}, refitting"
+                )
+                return _refit(project_id, docs, embeddings, hashes)
+
+            for i, topic, is_unmatched in zip(new_indices, predictions, unmatched):
+                assignments[hashes[i]] = -1 if is_unmatched else int(topic)
+            _write_json_atomic(os.path.join(model_dir, _ASSIGNMENTS_FILE), assignments)
+
+        logger.info(
+            f"Reused topic model for project {project_id}: "
+            f"{len(new_indices)} new documents assigned incrementally"
+        )
+        return topic_model, [int(assignments[h]) for h in hashes]
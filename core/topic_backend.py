@@ -0,0 +1,85 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from runpod import RunPodLogger
+from utils.tracing import span
+
+logger = RunPodLogger()
+
+
+class TopicBackend(ABC):
+    """
+    Interface of the topic modeling engine used by the clustering branch of the
+    view pipeline. Implementations import their dependencies when constructed,
+    so that jobs which never cluster never load them.
+    """
+
+    @abstractmethod
+    def representative_documents(
+        self, docs: List[str], token_budget: int, project_id: Optional[str] = None
+    ) -> str:
+        """
+        Cluster documents into topics and format the most representative
+        documents of each topic for the topic modeling prompt.
+
+        Args:
+            docs: Documents to cluster
+            token_budget: Maximum number of tokens of the formatted documents
+            project_id: Optional project ID; lets the backend reuse the project's stored model
+
+        Returns:
+            str: Representative documents grouped by topic
+        """
+
+
+class BERTopicBackend(TopicBackend):
+    """
+    Topic backend built on BERTopic, with embeddings from the shared
+    SentenceTransformer and per-project incremental topic models.
+    """
+
+    def __init__(self):
+        # torch, sentence_transformers, umap, hdbscan, bertopic and sklearn
+        from core.topic_modeling import (
+            embed_documents,
+            select_representative_docs,
+            format_representative_documents,
+        )
+        from core.incremental_topic_model import fit_project_topic_model
+
+        self._embed_documents = embed_documents
+        self._select_representative_docs = select_representative_docs
+        self._format_representative_documents = format_representative_documents
+        self._fit_project_topic_model = fit_project_topic_model
+
+    def representative_documents(
+        self, docs: List[str], token_budget: int, project_id: Optional[str] = None
+    ) -> str:
+        with span("topic_model.embed", docs=len(docs)):
+            embeddings = self._embed_documents(docs)
+        # Reuses the project's stored topic model when only few segments are new
+        with span("topic_model.fit", docs=len(docs)):
+            topic_model, topics = self._fit_project_topic_model(project_id, docs, embeddings)
+        with span("topic_model.representative_docs"):
+            repr_docs = self._select_representative_docs(
+                topic_model, docs, topics, token_budget=token_budget
+            )
+            return self._format_representative_documents(repr_docs)
+
+
+_topic_backend: Optional[TopicBackend] = None
+_topic_backend_lock = threading.Lock()
+
+
+def get_topic_backend() -> TopicBackend:
+    """
+    Return the worker-wide topic backend, importing the topic modeling stack on
+    first use.
+    """
+    global _topic_backend
+    with _topic_backend_lock:
+        if _topic_backend is None:
+            logger.info("Loading the BERTopic topic backend")
+            _topic_backend = BERTopicBackend()
+        return _topic_backend
@@ -1,6 +1,8 @@
 import os
-from typing import List, Optional
+import threading
+from typing import Dict, List, Optional
 
+import numpy as np
 import torch
 from umap import UMAP
 from runpod import RunPodLogger
@@ -8,22 +10,116 @@ from hdbscan import HDBSCAN
 from bertopic import BERTopic
 from bertopic.vectorizers import ClassTfidfTransformer
 from sentence_transformers import SentenceTransformer
+from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import CountVectorizer
+from utils.token_budget import get_token_counter
+from core.embedding_cache import get_embedding_cache
 
 logger = RunPodLogger()
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# Local copy of the model weights baked into the image; falls back to the hub
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH")
 
-def initialize_topic_model():
+# Process-wide model registry. The embedding model is loaded once per worker and
+# shared by every BERTopic instance handed out by initialize_topic_model().
+_embedding_model: Optional[SentenceTransformer] = None
+_embedding_model_lock = threading.Lock()
+# Serialises inference when several jobs embed at once, bounding device memory
+_encode_lock = threading.Lock()
+
+
+def get_device() -> str:
+    """
+    Resolve the torch device used for embedding.
+
+    Returns:
+        str: "cuda" if a GPU is available and RUN_CPU is not set, otherwise "cpu"
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    if os.environ.get("RUN_CPU") == "True":
+        device = "cpu"
+    return device
+
+
+def get_embedding_model() -> SentenceTransformer:
+    """
+    Return the shared SentenceTransformer, loading it on first use.
+
+    The weights are loaded at most once per worker process, from
+    EMBEDDING_MODEL_PATH if that directory exists, else from the Hugging Face
+    hub; subsequent calls return the cached instance.
+
+    Returns:
+        SentenceTransformer: Embedding model placed on the resolved device
+
+    Raises:
+        Exception: If the model cannot be loaded
+    """
+    global _embedding_model
+    if _embedding_model is not None:
+        return _embedding_model
+
+    with _embedding_model_lock:
+        if _embedding_model is None:
+            device = get_device()
+            model_path = EMBEDDING_MODEL_NAME
+            if EMBEDDING_MODEL_PATH and os.path.isdir(EMBEDDING_MODEL_PATH):
+                model_path = EMBEDDING_MODEL_PATH
+            logger.info(f"Loading embedding model {model_path} on device: {device}")
+            _embedding_model = SentenceTransformer(model_path, device=device)
+    return _embedding_model
+
+
+def embed_documents(docs: List[str]) -> np.ndarray:
     """
-    Initialize BERTopic model with GPU acceleration if available.
+    Embed documents with the shared embedding model, reusing cached embeddings.
+
+    Only documents whose text is not in the embedding cache yet are encoded.
+
+    Args:
+        docs: Documents to embed
+
+    Returns:
+        np.ndarray: One embedding per document, in input order
+    """
+    embedding_model = get_embedding_model()
+
+    def encode(texts: List[str]) -> np.ndarray:
+        with _encode_lock:
+            return embedding_model.encode(texts, show_progress_bar=False)
+
+    cache = get_embedding_cache(
+        EMBEDDING_MODEL_NAME, embedding_model.get_sentence_embedding_dimension()
+    )
+    if cache is None:
+        return encode(docs)
+    try:
+        return cache.get_or_compute(docs, encode)
+    except Exception as e:
+        logger.error(f"Embedding cache failed, embedding without cache: {e}")
+        return encode(docs)
+
+
+def initialize_topic_model(calculate_probabilities: bool = True):
+    """
+    Initialize a fresh, unfitted BERTopic model around the shared embedding model.
 
     The function configures a BERTopic model with the following components:
-    - Sentence transformer for embeddings (GPU-accelerated if available)
+    - Sentence transformer for embeddings (shared, GPU-accelerated if available)
     - UMAP for dimensionality reduction
     - HDBSCAN for clustering
     - CountVectorizer for text preprocessing
     - ClassTfidfTransformer for topic representation
 
+    UMAP, HDBSCAN and the vectorizers are stateful once fitted, so a new set is
+    created on every call; only the embedding model is reused.
+
+    Args:
+        calculate_probabilities: Whether to compute the full document x topic
+            probability matrix (and the HDBSCAN prediction data it needs). Leave
+            off when only topic assignments and representations are used.
+
     Returns:
         BERTopic: Initialized topic model ready for document processing
 
@@ -31,18 +127,12 @@ def initialize_topic_model():
         Exception: If model initialization fails
     """
     try:
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        if os.environ.get("RUN_CPU") == "True":
-            device = "cpu"
-        logger.info(f"Using device: {device}")
-
-        if device == "cuda":
-            embedding_model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
-        else:
-            embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+        embedding_model = get_embedding_model()
 
         umap_model = UMAP(n_neighbors=15, n_components=10, metric="cosine", random_state=42)
-        hdbscan_model = HDBSCAN(min_cluster_size=5, metric="euclidean", prediction_data=True)
+        hdbscan_model = HDBSCAN(
+            min_cluster_size=5, metric="euclidean", prediction_data=calculate_probabilities
+        )
         vectorizer_model = CountVectorizer(
             ngram_range=(1, 2), stop_words="english", min_df=2, max_features=5000
         )
@@ -54,7 +144,7 @@ def initialize_topic_model():
             hdbscan_model=hdbscan_model,
             vectorizer_model=vectorizer_model,
             ctfidf_model=ctfidf_model,
-            calculate_probabilities=True,
+            calculate_probabilities=calculate_probabilities,
             verbose=True,
             top_n_words=15,
             min_topic_size=5,
@@ -69,7 +159,12 @@ def initialize_topic_model():
 
 
 def run_topic_model_hierarchical(
-    topic_model, docs, topics: Optional[List[str]] = None, nr_topics: Optional[int] = None
+    topic_model,
+    docs,
+    topics: Optional[List[str]] = None,
+    nr_topics: Optional[int] = None,
+    embeddings: Optional[np.ndarray] = None,
+    compute_hierarchy: bool = True,
 ):
     """
     Run hierarchical topic modeling on the provided documents.
@@ -79,15 +174,18 @@ def run_topic_model_hierarchical(
         docs: List of documents to process
         topics: Optional list of predefined topics
         nr_topics: Optional number of topics to reduce to after fitting
+        embeddings: Optional precomputed document embeddings; skips embedding the docs
+        compute_hierarchy: Whether to compute the topic hierarchy. The lean mode
+            (False) only fits topics, which is all the view pipeline needs.
 
     Returns:
         tuple: Contains:
             - topics: List of identified topics
             - probs: Topic probabilities for each document
-            - hierarchical_topics: Hierarchical structure of topics
+            - hierarchical_topics: Hierarchical structure of topics, or None if not computed
     """
     # First fit the model normally
-    topics, probs = topic_model.fit_transform(docs)
+    topics, probs = topic_model.fit_transform(docs, embeddings=embeddings)
 
     # If nr_topics is specified, reduce the topics
     if nr_topics is not None:
@@ -95,5 +193,126 @@ def run_topic_model_hierarchical(
         topics = topic_model.topics_
         probs = topic_model.probabilities_
 
-    hierarchical_topics = topic_model.hierarchical_topics(docs)
+    hierarchical_topics = None
+    if compute_hierarchy:
+        hierarchical_topics = topic_model.hierarchical_topics(docs)
     return topics, probs, hierarchical_topics
+
+
+def rank_representative_docs(
+    topic_model: BERTopic, docs: List[str], topics: List[int], nr_samples: int = 1000
+) -> Dict[int, List[int]]:
+    """
+    Rank candidate documents per topic by how representative they are.
+
+    Candidates are sampled per topic (at most nr_samples) and ranked by the
+    cosine similarity between their c-TF-IDF representation and the topic's,
+    the same measure BERTopic uses for its representative documents. Duplicate
+    texts within a topic are ranked only once.
+
+    Args:
+        topic_model: Fitted BERTopic model
+        docs: Documents the model was fitted on
+        topics: Topic assignment per document
+        nr_samples: Maximum number of candidates considered per topic
+
+    Returns:
+        Dict[int, List[int]]: Document indices per topic, most representative first
+    """
+    topics_array = np.asarray(topics)
+    rng = np.random.default_rng(42)
+    # Rows of c_tf_idf_ follow the sorted topic labels
+    labels = sorted(topic_model.topic_representations_.keys())
+
+    ranked: Dict[int, List[int]] = {}
+    for index, topic in enumerate(labels):
+        doc_indices = np.flatnonzero(topics_array == topic)
+        if len(doc_indices) == 0:
+            continue
+        if len(doc_indices) > nr_samples:
+            doc_indices = np.sort(rng.choice(doc_indices, size=nr_samples, replace=False))
+
+        unique_docs: Dict[str, int] = {}
+        for doc_index in doc_indices:
+            unique_docs.setdefault(docs[doc_index], int(doc_index))
+        candidates = np.fromiter(unique_docs.values(), dtype=int)
+
+        bow = topic_model.vectorizer_model.transform([docs[i] for i in candidates])
+        ctfidf = topic_model.ctfidf_model.transform(bow)
+        similarity = cosine_similarity(ctfidf, topic_model.c_tf_idf_[index]).ravel()
+        ranked[topic] = candidates[np.argsort(-similarity, kind="stable")].tolist()
+    return ranked
+
+
+def format_representative_documents(repr_docs: Dict[int, List[str]]) -> str:
+    """
+    Format representative documents per topic into a single prompt block.
+    """
+    nl = "\n\n"
+    rep_docs_formatted = [f"Document set {k} : \n {nl.join(v)}" for k, v in repr_docs.items()]
+    return "\n\n\n\n\n\n".join(rep_docs_formatted)
+
+
+def select_representative_docs(
+    topic_model: BERTopic,
+    docs: List[str],
+    topics: List[int],
+    token_budget: int,
+    max_docs_per_topic: int = 100,
+    min_docs_per_topic: int = 3,
+    nr_samples: int = 1000,
+) -> Dict[int, List[str]]:
+    """
+    Pick the largest number of representative documents per topic that fits a token budget.
+
+    Candidates are ranked once per topic, their token counts are computed in a
+    single batch, and a binary search over per-topic prefix sums finds the
+    largest k such that the top-k documents of every topic fit in token_budget.
+    The outlier topic (-1) is skipped.
+
+    Args:
+        topic_model: Fitted BERTopic model
+        docs: Documents the model was fitted on
+        topics: Topic assignment per document
+        token_budget: Maximum number of tokens of the formatted documents
+        max_docs_per_topic: Upper bound for k
+        min_docs_per_topic: Lower bound for k, used even if it exceeds the budget
+        nr_samples: Maximum number of candidates considered per topic
+
+    Returns:
+        Dict[int, List[str]]: Representative documents per topic, most representative first
+    """
+    token_counter = get_token_counter()
+    ranked = rank_representative_docs(topic_model, docs, topics, nr_samples=nr_samples)
+    ranked = {k: v[:max_docs_per_topic] for k, v in ranked.items() if k != -1}
+    if not ranked:
+        return {}
+
+    candidate_indices = [i for doc_indices in ranked.values() for i in doc_indices]
+    candidate_counts = dict(
+        zip(candidate_indices, token_counter.count_batch([docs[i] for i in candidate_indices]))
+    )
+    separator_tokens = token_counter.count("\n\n")
+    header_tokens = sum(
+        token_counter.count_batch([f"Document set {k} : \n " for k in ranked])
+    ) + token_counter.count("\n\n\n\n\n\n") * (len(ranked) - 1)
+    prefix_sums = {
+        topic: np.cumsum([0] + [candidate_counts[i] + separator_tokens for i in doc_indices])
+        for topic, doc_indices in ranked.items()
+    }
+
+    def cost(k: int) -> int:
+        return header_tokens + sum(
+            int(sums[min(k, len(sums) - 1)]) for sums in prefix_sums.values()
+        )
+
+    low, high = min_docs_per_topic, max(max_docs_per_topic, min_docs_per_topic)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if cost(mid) <= token_budget:
+            low = mid
+        else:
+            high = mid - 1
+    logger.info(f"Selected up to {low} representative docs per topic ({cost(low)} tokens)")
+
+    return {topic: [docs[i] for i in doc_indices[:low]] for topic, doc_indices in ranked.items()}
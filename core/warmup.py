@@ -0,0 +1,86 @@
+import os
+import time
+import importlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+from runpod import RunPodLogger
+
+logger = RunPodLogger()
+
+# Numba compiles per signature, not per corpus size, so a small corpus compiles
+# the same UMAP and HDBSCAN kernels as a real one
+WARMUP_CORPUS_SIZE = int(os.getenv("WARMUP_CORPUS_SIZE", 300))
+
+
+def _synthetic_corpus(
+    n_docs: int, n_clusters: int = 20, dim: int = 384
+) -> Tuple[List[str], np.ndarray]:
+    rng = np.random.default_rng(0)
+    shared_vocabulary = np.array([f"shared{i}" for i in range(100)])
+    vocabularies = np.array([[f"topic{c}word{i}" for i in range(20)] for c in range(n_clusters)])
+    clusters = rng.integers(0, n_clusters, size=n_docs)
+    docs = [
+        " ".join(np.concatenate([rng.choice(vocabularies[c], 8), rng.choice(shared_vocabulary, 4)]))
+        for c in clusters
+    ]
+    centers = rng.normal(size=(n_clusters, dim))
+    embeddings = centers[clusters] + rng.normal(scale=0.3, size=(n_docs, dim))
+    return docs, embeddings.astype(np.float32)
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Prepare the worker before it accepts jobs, so the first job does not pay
+    for model loading and JIT compilation.
+
+    Steps: load the embedding model (from EMBEDDING_MODEL_PATH when baked into
+    the image), run one dummy encode, load the tokenizer, and fit a lean topic
+    model on a synthetic corpus to compile the numba kernels behind UMAP and
+    HDBSCAN. A failing step is logged and does not prevent the worker from
+    starting.
+
+    Returns:
+        Dict[str, float]: Seconds taken per step
+    """
+    timings: Dict[str, float] = {}
+
+    def step(name: str, func) -> None:
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"Warm-up step {name} failed: {e}")
+        timings[name] = time.perf_counter() - start
+        logger.info(f"Warm-up step {name} took {timings[name]:.2f}s")
+
+    # Imported here so that the import time itself is reported
+    step("imports", lambda: importlib.import_module("core.topic_modeling"))
+
+    from core.topic_modeling import (
+        get_embedding_model,
+        initialize_topic_model,
+        run_topic_model_hierarchical,
+    )
+    from utils.token_budget import get_token_counter
+
+    step("load_embedding_model", get_embedding_model)
+    step("encode", lambda: get_embedding_model().encode(["warm-up"], show_progress_bar=False))
+    step("load_tokenizer", lambda: get_token_counter().count("warm-up"))
+
+    def fit_topic_model() -> None:
+        docs, embeddings = _synthetic_corpus(WARMUP_CORPUS_SIZE)
+        topic_model = initialize_topic_model(calculate_probabilities=False)
+        # UMAP only uses NNDescent from 4096 samples on; force it to compile that path too
+        topic_model.umap_model.force_approximation_algorithm = True
+        run_topic_model_hierarchical(
+            topic_model, docs, embeddings=embeddings, compute_hierarchy=False
+        )
+
+    step("compile_topic_model", fit_topic_model)
+
+    logger.info(
+        f"Warm-up finished in {sum(timings.values()):.2f}s: "
+        + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
+    )
+    return timings
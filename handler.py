@@ -1,13 +1,92 @@
 import os
+import json
+import asyncio
+from typing import Optional
 
 import runpod
 from utils import get_views_aspects, get_views_aspects_fallback
 from runpod import RunPodLogger
+from utils.retry import retry_budget
+from utils.tracing import start_trace
+from utils.concurrency import job_concurrency_modifier
+from integrations.http_pool import close_sessions
+from integrations.rag_client import close_rag_clients
 
 logger = RunPodLogger()
 
+# Total retries of all calls made for one job, and seconds until the job's deadline
+JOB_RETRY_BUDGET = int(os.getenv("JOB_RETRY_BUDGET", 30))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT")) if os.getenv("JOB_TIMEOUT") else None
+
+
+_shutdown_task: Optional[asyncio.Task] = None
+
+
+async def _close_http_pools_on_shutdown() -> None:
+    # The worker's event loop cancels its pending tasks when it shuts down, so
+    # the pooled sessions are closed on that loop right before it is closed
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await close_rag_clients()
+        await close_sessions()
+        logger.info("Closed HTTP connection pools")
+
+
+def _install_shutdown_hook() -> None:
+    global _shutdown_task
+    if _shutdown_task is None or _shutdown_task.get_loop() is not asyncio.get_running_loop():
+        _shutdown_task = asyncio.create_task(_close_http_pools_on_shutdown())
+
 
 async def handler(event):
+    return await run_job(event)
+
+
+async def run_job(event, progress=None):
+    """
+    Run a job with its retry budget and trace. The per-stage timing report is
+    logged and added to the output as "timings".
+    """
+    _install_shutdown_hook()
+    # Retries of every call made for this job share one budget and deadline
+    with start_trace(event.get("id")) as trace, retry_budget(
+        max_retries=JOB_RETRY_BUDGET, timeout=JOB_TIMEOUT
+    ):
+        try:
+            response = await process_job(event, progress=progress)
+        finally:
+            logger.info(f"Job timings: {json.dumps(trace.report())}")
+    if isinstance(response, dict):
+        response["timings"] = trace.report()
+    return response
+
+
+async def streaming_handler(event):
+    """
+    Generator handler: yields an event per completed pipeline stage (segments
+    loaded, tentative aspects, each aspect with its payload and then its image,
+    summary, persisted) and finally {"stage": "completed", "output": <view>}.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def run() -> dict:
+        try:
+            return await run_job(event, progress=events.put_nowait)
+        finally:
+            events.put_nowait(done)
+
+    task = asyncio.create_task(run())
+    try:
+        while (stage_event := await events.get()) is not done:
+            yield stage_event
+        yield {"stage": "completed", "output": await task}
+    finally:
+        task.cancel()
+
+
+async def process_job(event, progress=None):
     logger.info("Handler started - processing new request")
 
     input = event["input"]
@@ -22,6 +101,7 @@ async def handler(event):
 
     response_language = input["response_language"]
     project_analysis_run_id = input["project_analysis_run_id"]
+    project_id = input.get("project_id")
 
     logger.info(
         f"Processing {len(segment_ids)} segments for project_analysis_run_id: {project_analysis_run_id}"
@@ -48,6 +128,7 @@ async def handler(event):
                 response_language,
                 user_input=user_input,
                 user_input_description=user_input_description,
+                progress=progress,
             )
             logger.info("Fallback execution completed successfully")
             return response
@@ -65,6 +146,8 @@ async def handler(event):
             response_language,
             user_input=user_input,
             user_input_description=user_input_description,
+            project_id=project_id,
+            progress=progress,
         )
         logger.info("Standard execution completed successfully")
         return response
@@ -81,6 +164,7 @@ async def handler(event):
                     response_language,
                     user_input=user_input,
                     user_input_description=user_input_description,
+                    progress=progress,
                 )
                 logger.info(
                     "Fallback execution completed successfully after standard method failure"
@@ -92,4 +176,22 @@ async def handler(event):
                 raise e
 
 
-runpod.serverless.start({"handler": handler})
+if os.getenv("WARMUP_ENABLED", "false").lower() == "true":
+    from core.warmup import warm_up
+
+    warm_up()
+
+# Streaming mode yields stage events and partial aspects as they complete;
+# /stream returns them live and /run, /runsync the aggregated list
+if os.getenv("STREAM_RESULTS", "false").lower() == "true":
+    runpod.serverless.start(
+        {
+            "handler": streaming_handler,
+            "return_aggregate_stream": True,
+            "concurrency_modifier": job_concurrency_modifier,
+        }
+    )
+else:
+    runpod.serverless.start(
+        {"handler": handler, "concurrency_modifier": job_concurrency_modifier}
+    )
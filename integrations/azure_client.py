@@ -1,20 +1,175 @@
 import os
+import copy
 import json
 import asyncio
-from typing import Dict, List
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from dataclasses import dataclass
 
+import httpx
+import litellm
 from runpod import RunPodLogger
-from litellm import completion
+from litellm import acompletion
 from pydantic import BaseModel
+from utils.cache import AsyncTTLCache, SQLiteCacheBackend
+from utils.helpers import default_storage_path
+from utils.retry import cap_timeout
+from utils.tracing import span, add_counter
+from utils.concurrency import get_limiter, track_llm_tokens
 
 logger = RunPodLogger()
 
+MODEL_ENV_VARS = {"small": "AZURE_MODEL", "large": "AZURE_MODEL_LARGE"}
+# Seconds an LLM call may take, further capped at the job's deadline
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", 600))
+
+
+@dataclass(frozen=True)
+class LLMConfig:
+    model: str
+    api_key: str
+    api_base: str
+    api_version: str
+
+
+_llm_configs: Dict[str, LLMConfig] = {}
+_llm_configs_lock = threading.Lock()
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_llm_config(model_type: str = "small") -> LLMConfig:
+    """
+    Resolve and validate the LLM configuration for a model type.
+
+    The environment is read and validated once per model type; later calls
+    return the cached configuration.
+
+    Args:
+        model_type: "small" or "large" to select the model to use
+
+    Returns:
+        LLMConfig: Model name and Azure credentials
+
+    Raises:
+        ValueError: If the model type is invalid or required environment variables are missing
+    """
+    config = _llm_configs.get(model_type)
+    if config is not None:
+        return config
+
+    if model_type not in MODEL_ENV_VARS:
+        raise ValueError(f"Invalid model_type: {model_type}. Must be 'small' or 'large'")
+
+    with _llm_configs_lock:
+        if model_type not in _llm_configs:
+            values = {
+                MODEL_ENV_VARS[model_type]: os.getenv(MODEL_ENV_VARS[model_type]),
+                "AZURE_API_KEY": os.getenv("AZURE_API_KEY"),
+                "AZURE_API_BASE": os.getenv("AZURE_API_BASE"),
+                "AZURE_API_VERSION": os.getenv("AZURE_API_VERSION"),
+            }
+            missing_vars = [var for var, val in values.items() if not val]
+            if missing_vars:
+                raise ValueError(
+                    f"Missing required environment variables: {', '.join(missing_vars)}"
+                )
+            _llm_configs[model_type] = LLMConfig(
+                model=str(values[MODEL_ENV_VARS[model_type]]),
+                api_key=str(values["AZURE_API_KEY"]),
+                api_base=str(values["AZURE_API_BASE"]),
+                api_version=str(values["AZURE_API_VERSION"]),
+            )
+    return _llm_configs[model_type]
+
+
+def _ensure_http_client() -> None:
+    """
+    Install a shared keep-alive httpx client for litellm's async calls.
+
+    httpx clients are bound to the event loop they are used on, so the client
+    is recreated if the running loop changes.
+    """
+    global _http_client_loop
+    loop = asyncio.get_running_loop()
+    if litellm.aclient_session is not None and _http_client_loop is loop:
+        return
+    max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 50))
+    litellm.aclient_session = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE", 60)),
+        ),
+        timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=10.0),
+    )
+    _http_client_loop = loop
+
+
+_llm_cache: Optional[AsyncTTLCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[AsyncTTLCache]:
+    """
+    Return the worker-wide cache of validated LLM responses, or None if disabled.
+
+    The cache is opt-in (LLM_CACHE_ENABLED=true). Responses are kept in memory
+    and in a SQLite file at LLM_CACHE_PATH (default: the RunPod network volume if
+    mounted, else ~/.cache), so a rerun of a failed job on any worker skips the
+    calls that already succeeded. Entries expire after LLM_CACHE_TTL seconds
+    (default: 7 days); at most LLM_CACHE_MAX_ENTRIES (default: 10000) are kept.
+    """
+    global _llm_cache
+    if os.getenv("LLM_CACHE_ENABLED", "false").lower() != "true":
+        return None
+
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+            cache_path = os.getenv("LLM_CACHE_PATH") or default_storage_path(
+                "llm_cache", "responses.sqlite"
+            )
+            try:
+                backend = SQLiteCacheBackend(cache_path, max_entries=max_entries)
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"LLM cache backend unavailable at {cache_path}: {e}")
+                backend = None
+            _llm_cache = AsyncTTLCache(
+                max_entries=min(max_entries, 1024),
+                ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+                backend=backend,
+            )
+        return _llm_cache
+
+
+def llm_cache_key(
+    model: str, messages: List[Dict[str, str]], response_format: type[BaseModel]
+) -> str:
+    """
+    Content address of an LLM call: the model, a hash of the messages and a hash
+    of the response schema.
+    """
+    messages_hash = hashlib.sha256(
+        json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    schema_hash = hashlib.sha256(
+        json.dumps(response_format.model_json_schema(), sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{model}|{messages_hash}|{schema_hash}"
+
 
 async def run_formated_llm_call_async(
     messages: List[Dict[str, str]], response_format: type[BaseModel], model_type: str = "small"
 ):
     """
-    Async version of run_formated_llm_call for parallel processing.
+    Run a structured LLM call with litellm's native async client.
+
+    Calls share one pooled HTTP client and are bounded by the worker-wide "llm"
+    limiter (LLM_CONCURRENCY), so no executor thread is held per call. With
+    LLM_CACHE_ENABLED=true, validated responses are cached by model, messages and
+    response schema.
 
     Args:
         messages: List of message dictionaries with 'role' and 'content' keys
@@ -27,50 +182,52 @@ async def run_formated_llm_call_async(
     Raises:
         ValueError: If no content is received from LLM response or invalid model type
     """
-    if model_type == "small":
-        model = str(os.getenv("AZURE_MODEL"))
-        api_key = os.getenv("AZURE_API_KEY")
-        api_base = os.getenv("AZURE_API_BASE")
-        api_version = os.getenv("AZURE_API_VERSION")
-    elif model_type == "large":
-        model = str(os.getenv("AZURE_MODEL_LARGE"))
-        api_key = os.getenv("AZURE_API_KEY")
-        api_base = os.getenv("AZURE_API_BASE")
-        api_version = os.getenv("AZURE_API_VERSION")
-    else:
-        raise ValueError(f"Invalid model_type: {model_type}. Must be 'small' or 'large'")
+    config = get_llm_config(model_type)
+    cache = get_llm_cache()
+    if cache is None:
+        return await _run_llm_call(messages, response_format, config)
 
-    # Validate that required environment variables are set
-    if not all([model, api_key, api_base, api_version]):
-        missing_vars = [
-            var
-            for var, val in [
-                ("AZURE_MODEL" if model_type == "small" else "AZURE_MODEL_LARGE", model),
-                ("AZURE_API_KEY", api_key),
-                ("AZURE_API_BASE", api_base),
-                ("AZURE_API_VERSION", api_version),
-            ]
-            if not val
-        ]
-        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-
-    loop = asyncio.get_event_loop()
-    response = await loop.run_in_executor(
-        None,
-        lambda: completion(
-            messages=messages,
-            model=model,
-            api_key=api_key,
-            api_base=api_base,
-            api_version=api_version,
-            response_format=response_format,
-        ),
+    response = await cache.get_or_compute(
+        llm_cache_key(config.model, messages, response_format),
+        lambda: _run_llm_call(messages, response_format, config),
     )
+    # Callers mutate the response, the cached copy must stay intact
+    return copy.deepcopy(response)
+
+
+async def _run_llm_call(
+    messages: List[Dict[str, str]], response_format: type[BaseModel], config: LLMConfig
+) -> dict:
+    _ensure_http_client()
+
+    # Rough prompt size (4 characters per token) for the worker's load estimate
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    async with get_limiter("llm"):
+        with span("llm.call", model=config.model, response_format=response_format.__name__) as s:
+            with track_llm_tokens(prompt_tokens):
+                response = await acompletion(
+                    messages=messages,
+                    model=config.model,
+                    api_key=config.api_key,
+                    api_base=config.api_base,
+                    api_version=config.api_version,
+                    response_format=response_format,
+                    timeout=cap_timeout(LLM_HTTP_TIMEOUT),
+                )
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                prompt_usage = getattr(usage, "prompt_tokens", 0) or 0
+                completion_usage = getattr(usage, "completion_tokens", 0) or 0
+                add_counter("llm.prompt_tokens", prompt_usage)
+                add_counter("llm.completion_tokens", completion_usage)
+                if s is not None:
+                    s.set_attribute("prompt_tokens", prompt_usage)
+                    s.set_attribute("completion_tokens", completion_usage)
 
     try:
         content = response.choices[0].message.content
     except (AttributeError, IndexError, KeyError) as e:
-        print(f"Error accessing response content: {e}")
+        logger.error(f"Error accessing response content: {e}")
         raise e
     if content is None:
         logger.error(f"LLM response content is None. Full response: {response}")
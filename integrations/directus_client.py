@@ -1,64 +1,428 @@
 import os
+import json
+import time
+import asyncio
+import threading
 from datetime import datetime, timezone
-from typing import Dict, List
+from typing import Any, Set, Dict, List, Callable, Optional, AsyncIterator
+
+import aiohttp
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from directus_sdk_py import DirectusClient
 from runpod import RunPodLogger
+from utils.retry import cap_timeout, async_retry_with_backoff
+from utils.tracing import traced
 from utils.helpers import generate_uuid
+from utils.checkpoint import JobCheckpoint
+from integrations.http_pool import get_session, request_timeout
 
 load_dotenv()
 logger = RunPodLogger()
 
 DIRECTUS_BASE_URL = str(os.getenv("DIRECTUS_BASE_URL"))
-DIRECTUS_USERNAME = str(os.getenv("DIRECTUS_USERNAME"))
-DIRECTUS_PASSWORD = str(os.getenv("DIRECTUS_PASSWORD"))
+DIRECTUS_USERNAME = os.getenv("DIRECTUS_USERNAME")
+DIRECTUS_PASSWORD = os.getenv("DIRECTUS_PASSWORD")
+DIRECTUS_TOKEN = os.getenv("DIRECTUS_TOKEN")
+
+# Seconds before expiry at which an access token is refreshed proactively
+TOKEN_REFRESH_MARGIN = 30
+# Maximum number of rows sent in a single bulk create request
+DIRECTUS_BATCH_SIZE = int(os.getenv("DIRECTUS_BATCH_SIZE", 100))
+# IDs per request and requests in flight when fetching items by ID
+DIRECTUS_ID_CHUNK_SIZE = int(os.getenv("DIRECTUS_ID_CHUNK_SIZE", 200))
+DIRECTUS_FETCH_CONCURRENCY = int(os.getenv("DIRECTUS_FETCH_CONCURRENCY", 4))
+
+
+class DirectusSession:
+    """
+    Shared Directus authentication state and keep-alive HTTP session.
+
+    The access token is cached until shortly before it expires and then renewed
+    with the refresh token, falling back to a full login. A static token
+    (DIRECTUS_TOKEN) skips authentication until the server rejects it; from then
+    on the session logs in with email and password, if they are configured. All
+    methods are safe to call from multiple threads; get_token_async() never
+    blocks the event loop on network I/O.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        email: Optional[str] = None,
+        password: Optional[str] = None,
+        static_token: Optional[str] = None,
+        pool_maxsize: int = 20,
+    ):
+        self.url = url.rstrip("/")
+        self._email = email
+        self._password = password
+        self._static_token = static_token
+        self._lock = threading.RLock()
+        self._access_token: Optional[str] = None
+        self._refresh_token: Optional[str] = None
+        self._expires_at = 0.0
+        self._client: Optional[DirectusClient] = None
+        self._client_token: Optional[str] = None
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+    def _store_tokens(self, data: Dict[str, Any]) -> None:
+        self._access_token = data["access_token"]
+        self._refresh_token = data.get("refresh_token")
+        # Directus reports the access token lifetime in milliseconds
+        expires_in = float(data.get("expires") or 0) / 1000
+        self._expires_at = time.monotonic() + max(expires_in - TOKEN_REFRESH_MARGIN, 0)
+
+    def _login(self) -> None:
+        logger.info("Logging in to Directus")
+        response = self.http.post(
+            f"{self.url}/auth/login",
+            json={"email": self._email, "password": self._password},
+            timeout=cap_timeout(30),
+        )
+        response.raise_for_status()
+        self._store_tokens(response.json()["data"])
+
+    def _refresh(self) -> None:
+        logger.debug("Refreshing Directus access token")
+        response = self.http.post(
+            f"{self.url}/auth/refresh",
+            json={"refresh_token": self._refresh_token, "mode": "json"},
+            timeout=cap_timeout(30),
+        )
+        response.raise_for_status()
+        self._store_tokens(response.json()["data"])
+
+    def _token_is_valid(self) -> bool:
+        return self._access_token is not None and time.monotonic() < self._expires_at
+
+    def get_token(self) -> str:
+        """
+        Return a valid access token, refreshing or logging in when needed.
+
+        Returns:
+            str: Bearer token for the Directus API
+
+        Raises:
+            requests.HTTPError: If authentication fails
+        """
+        if self._static_token:
+            return self._static_token
+        if self._token_is_valid():
+            return str(self._access_token)
+
+        with self._lock:
+            if not self._token_is_valid():
+                if self._refresh_token:
+                    try:
+                        self._refresh()
+                    except Exception as e:
+                        logger.info(f"Directus token refresh failed, logging in again: {e}")
+                        self._login()
+                else:
+                    self._login()
+            return str(self._access_token)
+
+    async def get_token_async(self) -> str:
+        """
+        Async version of get_token; authentication runs in a worker thread.
+        """
+        if self._static_token:
+            return self._static_token
+        if self._token_is_valid():
+            return str(self._access_token)
+        return await asyncio.to_thread(self.get_token)
+
+    def invalidate(self) -> None:
+        """
+        Drop the cached access token, e.g. after the server answered 401.
+
+        A rejected static token is dropped for good when email and password are
+        configured, so that the next call logs in instead.
+        """
+        with self._lock:
+            self._expires_at = 0.0
+            if self._static_token and self._email and self._password:
+                logger.error(
+                    "Directus rejected DIRECTUS_TOKEN, logging in with username and password"
+                )
+                self._static_token = None
+
+    def get_client(self) -> DirectusClient:
+        """
+        Return a DirectusClient authenticated with the current access token.
+
+        The client is rebuilt only when the token changes.
+        """
+        token = self.get_token()
+        with self._lock:
+            if self._client is None or self._client_token != token:
+                self._client = DirectusClient(url=self.url, token=token)
+                self._client_token = token
+            return self._client
+
+    def request(self, method: str, path: str, **kwargs) -> Any:
+        """
+        Call the Directus REST API over the pooled session.
+
+        A 401 response invalidates the cached token and is retried once. The
+        timeout (default: 120 seconds) is capped at the current job's deadline.
+
+        Args:
+            method: HTTP method
+            path: API path, e.g. "/items/aspect"
+            **kwargs: Passed through to requests.Session.request
+
+        Returns:
+            Any: The "data" member of the JSON response, or None for empty bodies
+
+        Raises:
+            requests.HTTPError: If the request fails
+        """
+        timeout = kwargs.pop("timeout", 120)
+        extra_headers = kwargs.pop("headers", {})
+        for attempt in range(2):
+            headers = {**extra_headers, "Authorization": f"Bearer {self.get_token()}"}
+            response = self.http.request(
+                method,
+                f"{self.url}{path}",
+                headers=headers,
+                timeout=cap_timeout(timeout),
+                **kwargs,
+            )
+            if response.status_code != 401 or attempt == 1:
+                break
+            self.invalidate()
+        response.raise_for_status()
+        if not response.content:
+            return None
+        return response.json().get("data")
+
+
+_directus_session: Optional[DirectusSession] = None
+_directus_session_lock = threading.Lock()
+
+
+def get_directus_session() -> DirectusSession:
+    """
+    Return the worker-wide DirectusSession, creating it on first use.
+    """
+    global _directus_session
+    if _directus_session is None:
+        with _directus_session_lock:
+            if _directus_session is None:
+                _directus_session = DirectusSession(
+                    url=DIRECTUS_BASE_URL,
+                    email=DIRECTUS_USERNAME,
+                    password=DIRECTUS_PASSWORD,
+                    static_token=DIRECTUS_TOKEN,
+                )
+    return _directus_session
 
 
 def get_directus_client() -> DirectusClient:
-    directus_client = DirectusClient(
-        url=DIRECTUS_BASE_URL, email=DIRECTUS_USERNAME, password=DIRECTUS_PASSWORD
-    )
-    directus_client.login()
-    return directus_client
+    return get_directus_session().get_client()
 
 
 def get_directus_token():
-    DIRECTUS_USERNAME = str(os.getenv("DIRECTUS_USERNAME"))
-    DIRECTUS_PASSWORD = str(os.getenv("DIRECTUS_PASSWORD"))
-    client = DirectusClient(
-        url=DIRECTUS_BASE_URL, email=DIRECTUS_USERNAME, password=DIRECTUS_PASSWORD
+    return get_directus_session().get_token()
+
+
+@traced("directus.search")
+async def search_items_async(collection: str, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Query a collection with Directus SEARCH over the pooled aiohttp session.
+
+    A 401 response invalidates the cached token and is retried once.
+
+    Args:
+        collection: Directus collection name
+        query: Directus query (filter, fields, limit, ...)
+
+    Returns:
+        List[Dict[str, Any]]: Matching items
+    """
+    directus_session = get_directus_session()
+    session = get_session("directus")
+    for attempt in range(2):
+        token = await directus_session.get_token_async()
+        async with session.request(
+            "SEARCH",
+            f"{directus_session.url}/items/{collection}",
+            json={"query": query},
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=request_timeout(session),
+        ) as response:
+            if response.status == 401 and attempt == 0:
+                directus_session.invalidate()
+                continue
+            response.raise_for_status()
+            return (await response.json())["data"]
+    raise aiohttp.ClientError("Unreachable")
+
+
+async def iter_items_by_ids(
+    collection: str,
+    ids: List[str],
+    query: Dict[str, Any],
+    chunk_size: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Stream the items with the given IDs, fetched in chunks of IDs.
+
+    Each chunk is a separate SEARCH request with a bounded id filter, so the
+    query size no longer grows with the number of IDs. Chunks are fetched
+    concurrently within a sliding window of max_concurrency requests, retried
+    individually, and yielded in the order of ids.
+
+    Args:
+        collection: Directus collection name
+        ids: IDs of the items to fetch
+        query: Directus query (filter, fields, ...) applied on top of the id filter
+        chunk_size: IDs per request (default: DIRECTUS_ID_CHUNK_SIZE)
+        max_concurrency: Requests in flight (default: DIRECTUS_FETCH_CONCURRENCY)
+
+    Yields:
+        List[Dict[str, Any]]: Items of one chunk, in the order of their IDs
+
+    Raises:
+        Exception: If a chunk still fails after all retries
+    """
+    chunk_size = chunk_size or DIRECTUS_ID_CHUNK_SIZE
+    max_concurrency = max_concurrency or DIRECTUS_FETCH_CONCURRENCY
+    ids = list(dict.fromkeys(str(item_id) for item_id in ids))
+    chunks = [ids[start : start + chunk_size] for start in range(0, len(ids), chunk_size)]
+    position = {item_id: i for i, item_id in enumerate(ids)}
+
+    def fetch(chunk: List[str]) -> "asyncio.Task[List[Dict[str, Any]]]":
+        id_filter = {"id": {"_in": chunk}}
+        chunk_filter = {"_and": [id_filter, query["filter"]]} if query.get("filter") else id_filter
+        chunk_query = {**query, "filter": chunk_filter, "limit": len(chunk)}
+        return asyncio.create_task(
+            async_retry_with_backoff(
+                search_items_async,
+                max_retries=3,
+                initial_delay=1,
+                backoff_factor=2,
+                jitter=0.5,
+                logger=logger,
+                collection=collection,
+                query=chunk_query,
+            )
+        )
+
+    in_flight = [fetch(chunk) for chunk in chunks[:max_concurrency]]
+    next_chunk = len(in_flight)
+    try:
+        while in_flight:
+            items = await in_flight.pop(0)
+            if next_chunk < len(chunks):
+                in_flight.append(fetch(chunks[next_chunk]))
+                next_chunk += 1
+            items.sort(key=lambda item: position.get(str(item.get("id")), len(position)))
+            if items:
+                yield items
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+def _existing_ids(collection: str, ids: List[str]) -> Set[str]:
+    data = get_directus_session().request(
+        "GET",
+        f"/items/{collection}",
+        params={
+            "filter": json.dumps({"id": {"_in": ids}}),
+            "fields": "id",
+            "limit": len(ids),
+        },
     )
-    client.login()
-    token = client.get_token()
-    return token
+    return {str(item["id"]) for item in data or []}
+
+
+def create_items_in_batches(
+    collection: str,
+    rows: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    written: Optional[Set[str]] = None,
+    on_written: Optional[Callable[[str], None]] = None,
+) -> None:
+    """
+    Create items with Directus bulk create, sending rows as array payloads.
+
+    Args:
+        collection: Directus collection name
+        rows: Items to create; each must carry its own client-generated "id"
+        batch_size: Maximum rows per request (default: DIRECTUS_BATCH_SIZE)
+        written: Keys of the batches committed by an earlier attempt, when resuming
+            one. These batches are skipped; rows of the other batches that exist
+            already (committed but not recorded) are not created again.
+        on_written: Optional callable receiving the key of each committed batch
+
+    Raises:
+        requests.HTTPError: If any batch fails
+    """
+    if batch_size is None:
+        batch_size = DIRECTUS_BATCH_SIZE
+    session = get_directus_session()
+    for start in range(0, len(rows), batch_size):
+        batch_key = f"{collection}:{start}"
+        if written is not None and batch_key in written:
+            continue
+        batch = rows[start : start + batch_size]
+        if written is not None:
+            existing = _existing_ids(collection, [row["id"] for row in batch])
+            batch = [row for row in batch if row["id"] not in existing]
+        if batch:
+            # Only ask for the ids back to keep the responses small
+            session.request("POST", f"/items/{collection}", json=batch, params={"fields": "id"})
+            logger.debug(f"Created {len(batch)} items in {collection}")
+        if on_written is not None:
+            on_written(batch_key)
+
 
+def build_view_rows(response, project_analysis_run_id) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build the Directus rows of a generated view, with client-generated UUIDs.
 
-def update_directus(response, project_analysis_run_id) -> None:
+    Args:
+        response: Response dict as returned by get_views_aspects
+        project_analysis_run_id: ID of the analysis run the view belongs to
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Rows per collection: "view", "aspect"
+            and "aspect_segment"
+    """
     view = response["view"]
     title = view.get("title", "")
     description = view.get("description", "")
     summary = view.get("summary", "")
-    seed = view.get("seed", "")
     language = view.get("language", "en")
     aspects = view.get("aspects", [])
     user_input = view.get("user_input", "")
     user_input_description = view.get("user_input_description", "")
     view_id = generate_uuid()
-    get_directus_client().create_item(
-        "view",
-        item_data={
-            "id": str(view_id),
-            "name": title,
-            "description": description,
-            "summary": summary,
-            "language": language,
-            "processing_status": "Generating Aspects",
-            "processing_started_at": str(datetime.now(timezone.utc)),
-            "project_analysis_run_id": str(project_analysis_run_id),
-            "user_input": user_input,
-            "user_input_description": user_input_description,
-        },
-    )
+    view_row = {
+        "id": str(view_id),
+        "name": title,
+        "description": description,
+        "summary": summary,
+        "language": language,
+        "processing_status": "Generating Aspects",
+        "processing_started_at": str(datetime.now(timezone.utc)),
+        "project_analysis_run_id": str(project_analysis_run_id),
+        "user_input": user_input,
+        "user_input_description": user_input_description,
+    }
+
+    aspect_rows: List[Dict[str, Any]] = []
+    aspect_segment_rows: List[Dict[str, Any]] = []
     for rank, aspect in enumerate(aspects):
         aspect_id = generate_uuid()
         aspect_title = aspect.get("title", "")
@@ -66,8 +430,7 @@ def update_directus(response, project_analysis_run_id) -> None:
         aspect_summary = aspect.get("summary", "")
         segments = aspect.get("segments", [])
         image_url = aspect.get("image_url", "")
-        get_directus_client().create_item(
-            "aspect",
+        aspect_rows.append(
             {
                 "id": str(aspect_id),
                 "name": aspect_title,
@@ -77,7 +440,7 @@ def update_directus(response, project_analysis_run_id) -> None:
                 "image_url": image_url,
                 "view_id": str(view_id),
                 "rank": rank,
-            },
+            }
         )
         for segment in segments:
             aspect_segment_id = generate_uuid()
@@ -86,8 +449,7 @@ def update_directus(response, project_analysis_run_id) -> None:
             conversation_id = segment.get("conversation_id", "")
             verbatim_transcript = segment.get("verbatim_transcript", "")
             relevant_index = segment.get("relevant_segments", "")
-            get_directus_client().create_item(
-                "aspect_segment",
+            aspect_segment_rows.append(
                 {
                     "id": str(aspect_segment_id),
                     "description": segment_description,
@@ -96,14 +458,67 @@ def update_directus(response, project_analysis_run_id) -> None:
                     "conversation_id": str(conversation_id),
                     "verbatim_transcript": verbatim_transcript,
                     "relevant_index": relevant_index,
-                },
+                }
             )
-    get_directus_client().create_item(
-        "processing_status",
-        {
-            "project_analysis_run_id": str(project_analysis_run_id),
-            "event": "runpod:topic_modeler.completed",
-            "message": "view_id: " + str(view_id),
-        },
+
+    return {"view": [view_row], "aspect": aspect_rows, "aspect_segment": aspect_segment_rows}
+
+
+@traced("directus.update")
+def update_directus(
+    response, project_analysis_run_id, checkpoint: Optional[JobCheckpoint] = None
+) -> None:
+    """
+    Persist a generated view with its aspects and aspect segments.
+
+    All rows are built up front with client-generated UUIDs and written with bulk
+    creates in dependency order (view, aspects, aspect segments). The
+    processing_status completion event is only written once everything else has
+    been committed.
+
+    With a checkpoint, the rows are checkpointed as "directus_rows" before the
+    first write and every committed batch is recorded in "directus_written". A
+    retried job then writes the same rows and skips what is already committed,
+    instead of creating a second view.
+
+    Args:
+        response: Response dict as returned by get_views_aspects
+        project_analysis_run_id: ID of the analysis run the view belongs to
+        checkpoint: Optional job checkpoint
+    """
+    rows = checkpoint.load("directus_rows") if checkpoint is not None else None
+    written: Optional[Set[str]] = None
+    if rows is not None and checkpoint is not None:
+        written = set(checkpoint.load("directus_written") or [])
+    else:
+        rows = build_view_rows(response, project_analysis_run_id)
+        if checkpoint is not None:
+            checkpoint.save("directus_rows", rows)
+
+    recorded: Set[str] = set(written or [])
+
+    def record(batch_key: str) -> None:
+        recorded.add(batch_key)
+        if checkpoint is not None:
+            checkpoint.save("directus_written", sorted(recorded))
+
+    for collection in ("view", "aspect", "aspect_segment"):
+        create_items_in_batches(collection, rows[collection], written=written, on_written=record)
+    view_id = rows["view"][0]["id"]
+    logger.info(
+        f"Persisted view {view_id} with {len(rows['aspect'])} aspects "
+        f"and {len(rows['aspect_segment'])} aspect segments"
     )
+
+    if "processing_status:completed" not in recorded:
+        get_directus_session().request(
+            "POST",
+            "/items/processing_status",
+            json={
+                "project_analysis_run_id": str(project_analysis_run_id),
+                "event": "runpod:topic_modeler.completed",
+                "message": "view_id: " + str(view_id),
+            },
+        )
+        record("processing_status:completed")
     return
@@ -0,0 +1,102 @@
+import os
+import asyncio
+import weakref
+from typing import Dict, Optional
+
+import aiohttp
+from runpod import RunPodLogger
+from utils.retry import cap_timeout
+
+logger = RunPodLogger()
+
+# aiohttp sessions are bound to the event loop they were created on, so pooled
+# sessions are kept per loop and per name (one pool per downstream service).
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, aiohttp.ClientSession]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def create_session(
+    limit: Optional[int] = None,
+    limit_per_host: Optional[int] = None,
+    keepalive_timeout: Optional[float] = None,
+    ttl_dns_cache: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> aiohttp.ClientSession:
+    """
+    Create an aiohttp session backed by a keep-alive connection pool.
+
+    Unset arguments fall back to the HTTP_POOL_* environment variables.
+
+    Args:
+        limit: Maximum number of open connections (HTTP_POOL_LIMIT, default: 100)
+        limit_per_host: Maximum connections per host (HTTP_POOL_LIMIT_PER_HOST, default: 20)
+        keepalive_timeout: Seconds an idle connection is kept (HTTP_POOL_KEEPALIVE, default: 60)
+        ttl_dns_cache: Seconds DNS results are cached (HTTP_POOL_DNS_TTL, default: 300)
+        timeout: Total request timeout in seconds (HTTP_POOL_TIMEOUT, default: 120)
+
+    Returns:
+        aiohttp.ClientSession: New session; the caller owns it and must close it
+    """
+    connector = aiohttp.TCPConnector(
+        limit=limit if limit is not None else int(os.getenv("HTTP_POOL_LIMIT", 100)),
+        limit_per_host=(
+            limit_per_host
+            if limit_per_host is not None
+            else int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+        ),
+        keepalive_timeout=(
+            keepalive_timeout
+            if keepalive_timeout is not None
+            else float(os.getenv("HTTP_POOL_KEEPALIVE", 60))
+        ),
+        ttl_dns_cache=(
+            ttl_dns_cache if ttl_dns_cache is not None else int(os.getenv("HTTP_POOL_DNS_TTL", 300))
+        ),
+    )
+    total_timeout = timeout if timeout is not None else float(os.getenv("HTTP_POOL_TIMEOUT", 120))
+    return aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=total_timeout)
+    )
+
+
+def get_session(name: str = "default") -> aiohttp.ClientSession:
+    """
+    Return the shared pooled session for a named downstream on the running loop.
+
+    Args:
+        name: Pool name, e.g. "image"
+
+    Returns:
+        aiohttp.ClientSession: Shared session, created on first use
+    """
+    loop = asyncio.get_running_loop()
+    loop_sessions = _sessions.setdefault(loop, {})
+    session = loop_sessions.get(name)
+    if session is None or session.closed:
+        session = create_session()
+        loop_sessions[name] = session
+    return session
+
+
+def request_timeout(session: aiohttp.ClientSession) -> aiohttp.ClientTimeout:
+    """
+    Timeout of a single request on a session: the session's total timeout,
+    capped at the current job's deadline.
+
+    Raises:
+        TimeoutError: If the job's deadline has already passed
+    """
+    return aiohttp.ClientTimeout(total=cap_timeout(session.timeout.total))
+
+
+async def close_sessions() -> None:
+    """
+    Close every shared session created on the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    loop_sessions = _sessions.pop(loop, {})
+    for name, session in loop_sessions.items():
+        if not session.closed:
+            await session.close()
+            logger.debug(f"Closed HTTP session pool: {name}")
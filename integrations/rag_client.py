@@ -1,57 +1,204 @@
 import os
-from typing import List, Optional
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
 
 import aiohttp
 import requests
 from runpod import RunPodLogger
-from utils.retry import retry_with_backoff, async_retry_with_backoff
+from requests.adapters import HTTPAdapter
+from utils.cache import AsyncTTLCache, SQLiteCacheBackend
+from utils.tracing import traced
+from utils.retry import cap_timeout, retry_with_backoff, async_retry_with_backoff
 
-from integrations.directus_client import get_directus_token
+from integrations.http_pool import create_session, request_timeout
+from integrations.directus_client import get_directus_token, get_directus_session
 
 logger = RunPodLogger()
 
+RAG_PROMPT_PATH = "/api/stateless/rag/get_lightrag_prompt"
+# Shorter prompts are the server's no-context answer, e.g.
+# "Sorry, I'm not able to provide an answer to that question.[no-context]"
+RAG_MIN_PROMPT_LENGTH = 100
 
-def _make_rag_request(url: str, payload: dict, headers: dict) -> str:
+
+class RAGClient:
     """
-    Helper function to make the actual RAG API request.
+    Per-worker client for the RAG server.
+
+    The client owns one pooled aiohttp session for async requests and one pooled
+    requests.Session for sync requests, so connections (and TLS handshakes) are
+    reused across aspects and retries. Call close() on shutdown.
 
     Args:
-        url: The API endpoint URL
-        payload: The request payload
-        headers: The request headers
+        rag_server_url: Base URL of the RAG server
+        limit: Maximum open connections (RAG_POOL_LIMIT, default: 20)
+        keepalive_timeout: Seconds idle connections are kept (RAG_POOL_KEEPALIVE, default: 60)
+        ttl_dns_cache: Seconds DNS lookups are cached (RAG_POOL_DNS_TTL, default: 300)
+        timeout: Total request timeout in seconds (default: 120)
+    """
 
-    Returns:
-        str: RAG prompt string from the server
+    def __init__(
+        self,
+        rag_server_url: str,
+        limit: Optional[int] = None,
+        keepalive_timeout: Optional[float] = None,
+        ttl_dns_cache: Optional[int] = None,
+        timeout: float = 120,
+    ):
+        self.url = f"{rag_server_url.rstrip('/')}{RAG_PROMPT_PATH}"
+        self.limit = limit if limit is not None else int(os.getenv("RAG_POOL_LIMIT", 20))
+        self.keepalive_timeout = (
+            keepalive_timeout
+            if keepalive_timeout is not None
+            else float(os.getenv("RAG_POOL_KEEPALIVE", 60))
+        )
+        self.ttl_dns_cache = (
+            ttl_dns_cache if ttl_dns_cache is not None else int(os.getenv("RAG_POOL_DNS_TTL", 300))
+        )
+        self.timeout = timeout
 
-    Raises:
-        Exception: If the API call fails
-    """
-    logger.debug(f"Making RAG API request to {url}")
-    response = requests.post(url, json=payload, headers=headers, timeout=120)
-    response.raise_for_status()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
 
-    result = response.text
-    logger.debug("Successfully retrieved RAG prompt")
-    return result
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.limit)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions are bound to their event loop
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = create_session(
+                limit=self.limit,
+                limit_per_host=self.limit,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+                timeout=self.timeout,
+            )
+            self._session_loop = loop
+        return self._session
 
-def get_rag_prompt(
-    query: str, segment_ids: Optional[List[str]] = None, rag_server_url: Optional[str] = None
-) -> str:
+    @staticmethod
+    def _build_payload(query: str, segment_ids: Optional[List[str]]) -> Dict:
+        return {
+            "query": query,
+            "conversation_history": None,
+            "echo_segment_ids": segment_ids,
+            "echo_conversation_ids": None,
+            "echo_project_ids": None,
+            "auto_select_bool": False,
+            "get_transcripts": False,
+            "top_k": 60,
+        }
+
+    def _request(self, payload: Dict, headers: Dict) -> str:
+        logger.debug(f"Making RAG API request to {self.url}")
+        response = self._http.post(
+            self.url, json=payload, headers=headers, timeout=cap_timeout(self.timeout)
+        )
+        response.raise_for_status()
+
+        result = response.text
+        logger.debug("Successfully retrieved RAG prompt")
+        return result
+
+    async def _request_async(self, payload: Dict, headers: Dict) -> str:
+        logger.debug(f"Making async RAG API request to {self.url}")
+        session = self._get_session()
+        async with session.post(
+            self.url, json=payload, headers=headers, timeout=request_timeout(session)
+        ) as response:
+            response.raise_for_status()
+            result = await response.text()
+            logger.debug("Successfully retrieved RAG prompt")
+            return result
+
+    def get_prompt(self, query: str, segment_ids: Optional[List[str]] = None) -> str:
+        """
+        Retrieve a RAG prompt with retry logic.
+
+        Raises:
+            Exception: If the API call fails after all retries
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {get_directus_token()}",
+        }
+
+        try:
+            return retry_with_backoff(
+                self._request,
+                max_retries=3,
+                initial_delay=2,
+                backoff_factor=2,
+                jitter=0.5,
+                logger=logger,
+                payload=self._build_payload(query, segment_ids),
+                headers=headers,
+            )
+        except Exception as e:
+            logger.error(f"Error calling API after all retries: {e}")
+            if hasattr(e, "response") and e.response is not None:
+                logger.error(f"Response status: {e.response.status_code}")
+                logger.error(f"Response text: {e.response.text}")
+            raise Exception(f"Failed to get RAG prompt from server: {str(e)}") from e
+
+    async def get_prompt_async(self, query: str, segment_ids: Optional[List[str]] = None) -> str:
+        """
+        Async version of get_prompt over the pooled aiohttp session.
+
+        Raises:
+            Exception: If the API call fails after all retries
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {await get_directus_session().get_token_async()}",
+        }
+
+        try:
+            return await async_retry_with_backoff(
+                self._request_async,
+                max_retries=3,
+                initial_delay=2,
+                backoff_factor=2,
+                jitter=0.5,
+                logger=logger,
+                payload=self._build_payload(query, segment_ids),
+                headers=headers,
+            )
+        except Exception as e:
+            logger.error(f"Error calling API after all retries: {e}")
+            raise Exception(f"Failed to get RAG prompt from server: {str(e)}") from e
+
+    async def close(self) -> None:
+        """
+        Close the pooled sessions. The client can still be used afterwards and
+        will open new sessions on demand.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        self._http.close()
+
+
+_rag_clients: Dict[str, RAGClient] = {}
+_rag_clients_lock = threading.Lock()
+
+
+def get_rag_client(rag_server_url: Optional[str] = None) -> RAGClient:
     """
-    Retrieve RAG prompt by calling the external RAG server API with retry logic.
+    Return the worker-wide RAGClient for a server URL, creating it on first use.
 
     Args:
-        query: The query string to send to the RAG server
-        segment_ids: Optional list of segment IDs to include in the RAG query
         rag_server_url: Optional base URL of the RAG server (defaults to env variable)
 
-    Returns:
-        str: RAG prompt string from the server
-
     Raises:
         ValueError: If RAG_SERVER_URL is not set and no URL is provided
-        Exception: If the API call fails after all retries
     """
     if rag_server_url is None:
         rag_server_url = os.getenv("RAG_SERVER_URL")
@@ -60,109 +207,106 @@ def get_rag_prompt(
                 "RAG_SERVER_URL environment variable not set and no rag_server_url provided"
             )
 
-    url = f"{rag_server_url.rstrip('/')}/api/stateless/rag/get_lightrag_prompt"
-
-    payload = {
-        "query": query,
-        "conversation_history": None,
-        "echo_segment_ids": segment_ids,
-        "echo_conversation_ids": None,
-        "echo_project_ids": None,
-        "auto_select_bool": False,
-        "get_transcripts": False,
-        "top_k": 60,
-    }
-
-    headers = {"Content-Type": "application/json"}
-    headers["Authorization"] = f"Bearer {get_directus_token()}"
-
-    try:
-        return retry_with_backoff(
-            _make_rag_request,
-            max_retries=3,
-            initial_delay=2,
-            backoff_factor=2,
-            jitter=0.5,
-            logger=logger,
-            url=url,
-            payload=payload,
-            headers=headers,
-        )
-    except Exception as e:
-        logger.error(f"Error calling API after all retries: {e}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Response status: {e.response.status_code}")
-            logger.error(f"Response text: {e.response.text}")
-        raise Exception(f"Failed to get RAG prompt from server: {str(e)}") from e
+    with _rag_clients_lock:
+        if rag_server_url not in _rag_clients:
+            _rag_clients[rag_server_url] = RAGClient(rag_server_url)
+        return _rag_clients[rag_server_url]
+
+
+_rag_cache: Optional[AsyncTTLCache] = None
+_rag_cache_lock = threading.Lock()
 
 
-async def _make_rag_request_async(url: str, payload: dict, headers: dict) -> str:
+def get_rag_cache() -> Optional[AsyncTTLCache]:
+    """
+    Return the worker-wide cache of RAG prompts, or None if caching is disabled.
+
+    The cache is opt-in (RAG_CACHE_ENABLED=true) and configured with
+    RAG_CACHE_TTL in seconds (default: 3600), RAG_CACHE_MAX_ENTRIES (default:
+    512) and RAG_CACHE_PATH, an optional SQLite file that persists the cache
+    across workers.
+    """
+    global _rag_cache
+    if os.getenv("RAG_CACHE_ENABLED", "false").lower() != "true":
+        return None
+
+    with _rag_cache_lock:
+        if _rag_cache is None:
+            backend = None
+            cache_path = os.getenv("RAG_CACHE_PATH")
+            if cache_path:
+                try:
+                    backend = SQLiteCacheBackend(cache_path)
+                except (OSError, sqlite3.Error) as e:
+                    logger.error(f"RAG cache backend unavailable at {cache_path}: {e}")
+            _rag_cache = AsyncTTLCache(
+                max_entries=int(os.getenv("RAG_CACHE_MAX_ENTRIES", 512)),
+                ttl=float(os.getenv("RAG_CACHE_TTL", 3600)),
+                backend=backend,
+            )
+        return _rag_cache
+
+
+def rag_cache_key(url: str, query: str, segment_ids: Optional[List[str]]) -> str:
+    """
+    Cache key of a RAG request: the server URL, the exact query and a hash of
+    the sorted set of segment IDs.
+    """
+    segments = "\n".join(sorted({str(segment_id) for segment_id in segment_ids or []}))
+    segments_hash = hashlib.sha256(segments.encode("utf-8")).hexdigest()
+    return f"{url}|{segments_hash}|{query}"
+
+
+async def close_rag_clients() -> None:
+    """
+    Shutdown hook: close the pooled sessions of every RAGClient.
+    """
+    with _rag_clients_lock:
+        clients = list(_rag_clients.values())
+        _rag_clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def get_rag_prompt(
+    query: str, segment_ids: Optional[List[str]] = None, rag_server_url: Optional[str] = None
+) -> str:
     """
-    Helper function to make the actual async RAG API request.
+    Retrieve RAG prompt by calling the external RAG server API with retry logic.
 
     Args:
-        url: The API endpoint URL
-        payload: The request payload
-        headers: The request headers
+        query: The query string to send to the RAG server
+        segment_ids: Optional list of segment IDs to include in the RAG query
+        rag_server_url: Optional base URL of the RAG server (defaults to env variable)
 
     Returns:
         str: RAG prompt string from the server
 
     Raises:
-        Exception: If the API call fails
+        ValueError: If RAG_SERVER_URL is not set and no URL is provided
+        Exception: If the API call fails after all retries
     """
-    logger.debug(f"Making async RAG API request to {url}")
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            url, json=payload, headers=headers, timeout=aiohttp.ClientTimeout(total=120)
-        ) as response:
-            response.raise_for_status()
-            result = await response.text()
-            logger.debug("Successfully retrieved RAG prompt")
-            return result
+    return get_rag_client(rag_server_url).get_prompt(query, segment_ids=segment_ids)
 
 
+@traced("rag.get_prompt")
 async def get_rag_prompt_async(
     query: str, segment_ids: Optional[List[str]] = None, rag_server_url: Optional[str] = None
 ) -> str:
     """
     Async version of get_rag_prompt for parallel processing with retry logic.
-    """
-    if rag_server_url is None:
-        rag_server_url = os.getenv("RAG_SERVER_URL")
-        if not rag_server_url:
-            raise ValueError(
-                "RAG_SERVER_URL environment variable not set and no rag_server_url provided"
-            )
 
-    url = f"{rag_server_url.rstrip('/')}/api/stateless/rag/get_lightrag_prompt"
-
-    payload = {
-        "query": query,
-        "conversation_history": None,
-        "echo_segment_ids": segment_ids,
-        "echo_conversation_ids": None,
-        "echo_project_ids": None,
-        "auto_select_bool": False,
-        "get_transcripts": False,
-        "top_k": 60,
-    }
-
-    headers = {"Content-Type": "application/json"}
-    headers["Authorization"] = f"Bearer {get_directus_token()}"
-
-    try:
-        return await async_retry_with_backoff(
-            _make_rag_request_async,
-            max_retries=3,
-            initial_delay=2,
-            backoff_factor=2,
-            jitter=0.5,
-            logger=logger,
-            url=url,
-            payload=payload,
-            headers=headers,
-        )
-    except Exception as e:
-        logger.error(f"Error calling API after all retries: {e}")
-        raise Exception(f"Failed to get RAG prompt from server: {str(e)}") from e
+    Prompts are cached per (query, segment set) when the RAG cache is enabled;
+    concurrent identical requests share a single call to the server. No-context
+    answers (shorter than RAG_MIN_PROMPT_LENGTH) are not cached, so a retry asks
+    the server again.
+    """
+    client = get_rag_client(rag_server_url)
+    cache = get_rag_cache()
+    if cache is None:
+        return await client.get_prompt_async(query, segment_ids=segment_ids)
+    return await cache.get_or_compute(
+        rag_cache_key(client.url, query, segment_ids),
+        lambda: client.get_prompt_async(query, segment_ids=segment_ids),
+        should_cache=lambda prompt: len(prompt) >= RAG_MIN_PROMPT_LENGTH,
+    )
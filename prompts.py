@@ -401,7 +401,15 @@ Transform document summaries into publication-ready reports that provide readers
 7. **Language Diversity**: Employ varied vocabulary and sentence structures to maintain reader engagement
 """
 
+# The large document block comes first and the per-aspect topic comes last, so that every
+# aspect request for the same job shares an identical prefix (enables provider prompt caching).
 fallback_get_aspect_response_list_user_prompt = """
+## Input Data
+**Document Summaries:**
+{document_summaries}
+
+**User Query:** {user_prompt}
+
 ## Task
 Analyze the provided document summaries and generate a clear, focused analysis of the specified topic. Your examination should synthesize information across all summaries to create practical insights about the topic.
 
@@ -416,14 +424,6 @@ Analyze the provided document summaries and generate a clear, focused analysis o
 8. **Anonymized**: Do not return segment ID, document count or any such information in the topic description/summary/header. Return only when explicitly asked for
 9. **Concise Communication**: Use varied language and avoid repetitive phrases
 
-## Input Data
-**Topic:** {aspect}
-
-**User Query:** {user_prompt}
-
-**Document Summaries:**
-{document_summaries}
-
 ## Response Language:
 {response_language}
 
@@ -478,4 +478,7 @@ Before finalizing your analysis, ensure it:
 - Presents findings in a logical, easy-to-follow structure
 - Focuses on actionable insights and practical implications
 - Avoids repetitive phrases and uses engaging, varied language
+
+## Topic To Analyze
+**Topic:** {aspect}
 """
@@ -1,4 +1,5 @@
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional
 
 from runpod import RunPodLogger
 from prompts import (
@@ -10,10 +11,13 @@ from prompts import (
 )
 from data_model import Aspect
 from tqdm.asyncio import tqdm
-from integrations.rag_client import get_rag_prompt_async
+from integrations.rag_client import RAG_MIN_PROMPT_LENGTH, get_rag_prompt_async
 from integrations.azure_client import run_formated_llm_call_async
 
-from services.image_generator import get_image_url_async
+from utils.progress import ProgressCallback, emit_progress
+from utils.checkpoint import JobCheckpoint
+from utils.concurrency import get_limiter, get_concurrency_limit
+from services.image_generator import wait_for_images, start_image_generation
 
 logger = RunPodLogger()
 
@@ -23,9 +27,14 @@ async def process_single_aspect(
     segment_ids: List[str],
     segment_2_transcript: Dict[int, str],
     response_language: str = "en",
+    image_tasks: Optional[List[asyncio.Task]] = None,
 ) -> Dict:
     """
     Process a single aspect asynchronously.
+
+    Image generation starts in the background once the aspect's segments are
+    rewritten. If image_tasks is given, the task is appended to it and left
+    running; otherwise it is awaited before returning.
     """
     # Format the initial RAG prompt
     formated_initial_rag_prompt = initial_rag_prompt.format(
@@ -33,11 +42,12 @@ async def process_single_aspect(
     )
 
     # Get RAG prompt asynchronously
-    rag_prompt = await get_rag_prompt_async(
-        formated_initial_rag_prompt, segment_ids=[str(segment_id) for segment_id in segment_ids]
-    )
+    async with get_limiter("rag"):
+        rag_prompt = await get_rag_prompt_async(
+            formated_initial_rag_prompt, segment_ids=[str(segment_id) for segment_id in segment_ids]
+        )
 
-    if len(rag_prompt) < 100:
+    if len(rag_prompt) < RAG_MIN_PROMPT_LENGTH:
         # Returns if nothing is found: Sorry, I'm not able to provide an answer to that question.[no-context]
         logger.error(f"RAG prompt is too short for aspect '{tentative_aspect_topic}'")
         raise ValueError(
@@ -60,17 +70,6 @@ async def process_single_aspect(
     # LLM call (litellm handles retries internally)
     formatted_response = await run_formated_llm_call_async(rag_messages, Aspect, model_type="large")
 
-    # Get image URL asynchronously
-    try:
-        formatted_response["image_url"] = await get_image_url_async(
-            formatted_response["title"], formatted_response["description"]
-        )
-    except Exception as e:
-        logger.error(
-            f"Error in async image generation for aspect '{formatted_response['title']}': {e}"
-        )
-        formatted_response["image_url"] = ""
-
     # Update segments (same logic)
     updated_segments = []
     for segment in formatted_response["segments"]:
@@ -85,60 +84,176 @@ async def process_single_aspect(
                 updated_segments.append(segment)
     formatted_response["segments"] = updated_segments
 
+    # Generate the image off the critical path; started only once the segments
+    # are rewritten, so a failing rewrite cannot leave the task orphaned
+    image_task = start_image_generation(formatted_response)
+    if image_tasks is None:
+        await wait_for_images([image_task])
+    else:
+        image_tasks.append(image_task)
+
     return formatted_response
 
 
+async def _finish_aspect(
+    index: int,
+    aspect: Dict,
+    image_tasks: List[asyncio.Task],
+    checkpoint: Optional[JobCheckpoint],
+    progress: Optional[ProgressCallback],
+) -> None:
+    # Checkpoint the aspect and report its image once the image URL is known
+    await wait_for_images(image_tasks)
+    if checkpoint is not None:
+        await checkpoint.save_async(f"aspect-{index}", aspect)
+    emit_progress(progress, "aspect_image", index=index, image_url=aspect.get("image_url", ""))
+
+
 async def get_aspect_response_list(
     aspects: List[str],
     segment_ids: List[str],
     segment_2_transcript: Dict[int, str],
     response_language: str = "en",
+    max_concurrency: Optional[int] = None,
+    image_tasks: Optional[List[asyncio.Task]] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+    progress: Optional[ProgressCallback] = None,
 ):
     """
     Generate detailed responses for each aspect using RAG and LLM processing.
-    Now processes aspects in parallel using async/await.
+
+    Aspects are processed concurrently, at most max_concurrency at a time. Calls
+    to the RAG server, the LLM and the image pipeline are additionally bounded by
+    the worker-wide limiters in utils.concurrency. A failing aspect is logged and
+    dropped without affecting the others.
 
     Args:
         aspects: List of aspect topics to analyze
         segment_ids: List of segment IDs to process
         segment_2_transcript: Dictionary mapping segment IDs to their transcripts
         response_language: Language code for response generation (default: 'en')
+        max_concurrency: Maximum number of aspects in flight (default: ASPECT_CONCURRENCY)
+        image_tasks: Optional list collecting the background image tasks. When given,
+            the caller must await them with wait_for_images() to get the image URLs;
+            otherwise they are awaited before returning.
+        checkpoint: Optional job checkpoint; each aspect is checkpointed as
+            "aspect-<index>" once complete, and checkpointed aspects are not reprocessed
+        progress: Optional progress callback, receiving an "aspect_completed" event
+            with the index and payload of each aspect as soon as its text is ready,
+            and an "aspect_image" event with its image URL once the image is uploaded
 
     Returns:
-        List[Dict]: List of aspect responses, each containing:
+        List[Dict]: List of aspect responses in the order of `aspects`, each containing:
             - title: Aspect title
             - description: Detailed description
             - summary: Brief summary
             - segments: List of relevant segments with transcripts
             - image_url: URL for any associated image
     """
-    # # Create tasks for all aspects to process them in parallel
-    # tasks = [
-    #     process_single_aspect(
-    #         tentative_aspect_topic, segment_ids, segment_2_transcript, response_language
-    #     )
-    #     for tentative_aspect_topic in aspects
-    # ]
-
-    # # Wait for all tasks to complete and collect results
-    # aspect_response_list = await asyncio.gather(*tasks)
-
-    aspect_response_list = []
-
-    for tentative_aspect_topic in tqdm(aspects, desc="Processing aspects"):
-        try:
-            aspect_response_list.append(
-                await process_single_aspect(
-                    tentative_aspect_topic, segment_ids, segment_2_transcript, response_language
+    if max_concurrency is None:
+        max_concurrency = get_concurrency_limit("aspect")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pending_images: List[asyncio.Task] = [] if image_tasks is None else image_tasks
+
+    async def _process(index: int, tentative_aspect_topic: str) -> Optional[Dict]:
+        if checkpoint is not None:
+            aspect = await checkpoint.load_async(f"aspect-{index}")
+            if aspect is not None:
+                # Checkpointed aspects already carry their image URL
+                emit_progress(progress, "aspect_completed", index=index, aspect=aspect)
+                emit_progress(
+                    progress, "aspect_image", index=index, image_url=aspect.get("image_url", "")
+                )
+                return aspect
+
+        aspect_images: List[asyncio.Task] = []
+        async with semaphore:
+            try:
+                aspect = await process_single_aspect(
+                    tentative_aspect_topic,
+                    segment_ids,
+                    segment_2_transcript,
+                    response_language,
+                    image_tasks=aspect_images,
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error in process_single_aspect for aspect '{tentative_aspect_topic}': {e}"
+                )
+                return None
+
+        emit_progress(progress, "aspect_completed", index=index, aspect=aspect)
+        if checkpoint is None and progress is None:
+            pending_images.extend(aspect_images)
+        else:
+            pending_images.append(
+                asyncio.create_task(
+                    _finish_aspect(index, aspect, aspect_images, checkpoint, progress)
                 )
             )
-        except Exception as e:
-            logger.error(
-                f"Error in process_single_aspect for aspect '{tentative_aspect_topic}': {e}"
-            )
-            continue
+        return aspect
 
-    return aspect_response_list
+    # gather keeps the results in the order of the input aspects
+    results = await tqdm.gather(
+        *[_process(i, tentative_aspect_topic) for i, tentative_aspect_topic in enumerate(aspects)],
+        desc="Processing aspects",
+    )
+    if image_tasks is None:
+        await wait_for_images(pending_images)
+
+    return [result for result in results if result is not None]
+
+
+async def process_single_fallback_aspect(
+    tentative_aspect_topic: str,
+    document_summaries: str,
+    user_prompt: str,
+    segment_2_transcript: Dict[int, str],
+    response_language: str = "en",
+    image_tasks: Optional[List[asyncio.Task]] = None,
+) -> Dict:
+    """
+    Process a single aspect on the fallback path, from the shared document summaries.
+
+    Image generation is handled as in process_single_aspect.
+
+    Raises:
+        Exception: If the LLM call fails
+    """
+    messages = [
+        {"role": "system", "content": fallback_get_aspect_response_list_system_prompt},
+        {
+            "role": "user",
+            "content": fallback_get_aspect_response_list_user_prompt.format(
+                document_summaries=document_summaries,
+                user_prompt=user_prompt,
+                response_language=response_language,
+                aspect=tentative_aspect_topic,
+            ),
+        },
+    ]
+    formatted_response = await run_formated_llm_call_async(messages, Aspect)
+
+    updated_segments = []
+    for segment in formatted_response["segments"]:
+        id = segment["segment_id"]
+        if id in segment_2_transcript.keys():
+            segment.pop("segment_id")
+            segment["id"] = id
+            segment["conversation_id"] = ""
+            segment["verbatim_transcript"] = segment_2_transcript[id]
+            segment["relevant_segments"] = f"0:{len(segment['verbatim_transcript']) - 1}"
+            updated_segments.append(segment)
+
+    formatted_response["segments"] = updated_segments
+
+    image_task = start_image_generation(formatted_response)
+    if image_tasks is None:
+        await wait_for_images([image_task])
+    else:
+        image_tasks.append(image_task)
+
+    return formatted_response
 
 
 async def fallback_get_aspect_response_list(
@@ -147,52 +262,91 @@ async def fallback_get_aspect_response_list(
     user_prompt: str,
     segment_2_transcript: Dict[int, str],
     response_language: str = "en",
+    max_concurrency: Optional[int] = None,
+    image_tasks: Optional[List[asyncio.Task]] = None,
+    checkpoint: Optional[JobCheckpoint] = None,
+    progress: Optional[ProgressCallback] = None,
 ):
-    aspect_response_list = []
-    for tentative_aspect_topic in aspects:
-        messages = [
-            {"role": "system", "content": fallback_get_aspect_response_list_system_prompt},
-            {
-                "role": "user",
-                "content": fallback_get_aspect_response_list_user_prompt.format(
-                    document_summaries=document_summaries,
-                    user_prompt=user_prompt,
-                    response_language=response_language,
-                    aspect=tentative_aspect_topic,
-                ),
-            },
-        ]
-        try:
-            formatted_response = await run_formated_llm_call_async(messages, Aspect)
-        except Exception as e:
-            logger.error(f"Error in LLM call for aspect '{tentative_aspect_topic}': {e}")
-            # Create a minimal response to continue processing
-            formatted_response = {
-                "title": tentative_aspect_topic,
-                "description": f"Error processing aspect: {str(e)}",
-                "summary": "Unable to generate summary due to processing error",
-                "segments": [],
-            }
-
-        try:
-            formatted_response["image_url"] = await get_image_url_async(
-                formatted_response["title"], formatted_response["description"]
+    """
+    Generate aspect responses directly from document summaries, without RAG.
+
+    Aspects are processed concurrently, at most max_concurrency at a time. All
+    requests share the same document summaries as their prompt prefix. Errors
+    from the LLM call are turned into a minimal aspect so that the fallback path
+    always returns one response per aspect; these are not checkpointed, so a
+    retried job processes the aspect again.
+
+    Args:
+        aspects: List of aspect topics to analyze
+        document_summaries: Formatted summaries shared by every aspect prompt
+        user_prompt: User's query or instruction for analysis
+        segment_2_transcript: Dictionary mapping segment IDs to their transcripts
+        response_language: Language code for response generation (default: 'en')
+        max_concurrency: Maximum number of aspects in flight (default: ASPECT_CONCURRENCY)
+        image_tasks: Optional list collecting the background image tasks, see
+            get_aspect_response_list
+        checkpoint: Optional job checkpoint, see get_aspect_response_list
+        progress: Optional progress callback, see get_aspect_response_list
+
+    Returns:
+        List[Dict]: One aspect response per input aspect, in the same order
+    """
+    if max_concurrency is None:
+        max_concurrency = get_concurrency_limit("aspect")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pending_images: List[asyncio.Task] = [] if image_tasks is None else image_tasks
+
+    async def _process(index: int, tentative_aspect_topic: str) -> Dict:
+        if checkpoint is not None:
+            aspect = await checkpoint.load_async(f"aspect-{index}")
+            if aspect is not None:
+                # Checkpointed aspects already carry their image URL
+                emit_progress(progress, "aspect_completed", index=index, aspect=aspect)
+                emit_progress(
+                    progress, "aspect_image", index=index, image_url=aspect.get("image_url", "")
+                )
+                return aspect
+
+        aspect_images: List[asyncio.Task] = []
+        aspect_checkpoint = checkpoint
+        async with semaphore:
+            try:
+                aspect = await process_single_fallback_aspect(
+                    tentative_aspect_topic,
+                    document_summaries,
+                    user_prompt,
+                    segment_2_transcript,
+                    response_language,
+                    image_tasks=aspect_images,
+                )
+            except Exception as e:
+                logger.error(f"Error in LLM call for aspect '{tentative_aspect_topic}': {e}")
+                # Create a minimal response to continue processing
+                aspect = {
+                    "title": tentative_aspect_topic,
+                    "description": f"Error processing aspect: {str(e)}",
+                    "summary": "Unable to generate summary due to processing error",
+                    "segments": [],
+                }
+                aspect_images.append(start_image_generation(aspect))
+                aspect_checkpoint = None
+
+        emit_progress(progress, "aspect_completed", index=index, aspect=aspect)
+        if checkpoint is None and progress is None:
+            pending_images.extend(aspect_images)
+        else:
+            pending_images.append(
+                asyncio.create_task(
+                    _finish_aspect(index, aspect, aspect_images, aspect_checkpoint, progress)
+                )
             )
-        except Exception as e:
-            logger.error(f"Error generating image for aspect '{tentative_aspect_topic}': {e}")
-            formatted_response["image_url"] = ""
-
-        updated_segments = []
-        for segment in formatted_response["segments"]:
-            id = segment["segment_id"]
-            if id in segment_2_transcript.keys():
-                segment.pop("segment_id")
-                segment["id"] = id
-                segment["conversation_id"] = ""
-                segment["verbatim_transcript"] = segment_2_transcript[id]
-                segment["relevant_segments"] = f"0:{len(segment['verbatim_transcript']) - 1}"
-                updated_segments.append(segment)
+        return aspect
+
+    aspect_response_list = await tqdm.gather(
+        *[_process(i, tentative_aspect_topic) for i, tentative_aspect_topic in enumerate(aspects)],
+        desc="Processing fallback aspects",
+    )
+    if image_tasks is None:
+        await wait_for_images(pending_images)
 
-        formatted_response["segments"] = updated_segments
-        aspect_response_list.append(formatted_response)
     return aspect_response_list
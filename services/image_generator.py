@@ -1,15 +1,28 @@
 import os
+import json
 import asyncio
 import tempfile
 import urllib.request
+from typing import Dict, List, AsyncIterator
 
+import aiohttp
 import requests
 from runpod import RunPodLogger
-from utils.retry import retry_with_backoff, async_retry_with_backoff
-from integrations.directus_client import DIRECTUS_BASE_URL, get_directus_client
+from aiohttp.payload import AsyncIterablePayload
+from utils.retry import cap_timeout, retry_with_backoff, async_retry_with_backoff
+from utils.tracing import traced
+from utils.concurrency import get_limiter
+from integrations.http_pool import get_session, request_timeout
+from integrations.directus_client import (
+    DIRECTUS_BASE_URL,
+    get_directus_client,
+    get_directus_session,
+)
 
 logger = RunPodLogger()
 
+IMAGE_TRANSFER_CHUNK_SIZE = int(os.getenv("IMAGE_TRANSFER_CHUNK_SIZE", 64 * 1024))
+
 
 def _generate_dalle_image(prompt: str) -> str:
     """
@@ -43,7 +56,7 @@ def _generate_dalle_image(prompt: str) -> str:
         azure_endpoint,
         headers=headers,
         json=payload,
-        timeout=120,
+        timeout=cap_timeout(120),
     )
     response.raise_for_status()
     response_data = response.json()
@@ -149,6 +162,7 @@ def get_image_url(aspect_title: str, aspect_summary: str) -> str:
         return ""
 
 
+@traced("image.generate")
 async def _generate_dalle_image_async(prompt: str) -> str:
     """
     Async helper function to generate image using DALL-E 3 API.
@@ -162,15 +176,30 @@ async def _generate_dalle_image_async(prompt: str) -> str:
     Raises:
         Exception: If the API call fails
     """
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _generate_dalle_image, prompt)
+    # to_thread carries the job's context (deadline, trace) into the thread
+    return await asyncio.to_thread(_generate_dalle_image, prompt)
+
 
+async def _iter_image_chunks(
+    response: aiohttp.ClientResponse, chunk_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Yield the body of a download response in chunks of at most chunk_size bytes.
+    """
+    async for chunk in response.content.iter_chunked(chunk_size):
+        yield chunk
 
+
+@traced("image.upload")
 async def _download_and_upload_image_async(
     image_url: str, aspect_title: str, aspect_summary: str
 ) -> str:
     """
-    Async helper function to download image and upload to Directus.
+    Async helper function to stream an image from its URL straight into Directus.
+
+    The download body is piped chunk by chunk into a multipart upload to the
+    Directus /files endpoint over the pooled "image" session, so at most
+    IMAGE_TRANSFER_CHUNK_SIZE bytes are held in memory and nothing touches disk.
 
     Args:
         image_url: The generated image URL
@@ -183,10 +212,55 @@ async def _download_and_upload_image_async(
     Raises:
         Exception: If download or upload fails
     """
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        None, _download_and_upload_image, image_url, aspect_title, aspect_summary
-    )
+    session = get_session("image")
+    directus_session = get_directus_session()
+    # A 401 invalidates the cached token; the image is streamed again with a new one
+    for attempt in range(2):
+        token = await directus_session.get_token_async()
+        async with session.get(image_url, timeout=request_timeout(session)) as download:
+            download.raise_for_status()
+            content_type = download.headers.get("Content-Type", "image/png")
+
+            with aiohttp.MultipartWriter("form-data") as form:
+                # Directus expects metadata fields before the file part
+                fields = {
+                    "title": f"Aspect Image - {aspect_title}",
+                    "description": f"Generated image for aspect: {aspect_summary}",
+                    "tags": json.dumps(["aspect", "generated", "dalle"]),
+                }
+                for name, value in fields.items():
+                    part = form.append(value)
+                    part.set_content_disposition("form-data", name=name)
+
+                file_part = form.append_payload(
+                    AsyncIterablePayload(
+                        _iter_image_chunks(download, IMAGE_TRANSFER_CHUNK_SIZE),
+                        content_type=content_type,
+                    )
+                )
+                file_part.set_content_disposition("form-data", name="file", filename="aspect.png")
+
+                async with session.post(
+                    f"{DIRECTUS_BASE_URL}/files",
+                    data=form,
+                    headers={"Authorization": f"Bearer {token}"},
+                    timeout=request_timeout(session),
+                ) as upload:
+                    if upload.status == 401 and attempt == 0:
+                        directus_session.invalidate()
+                        continue
+                    upload.raise_for_status()
+                    uploaded_file = (await upload.json()).get("data")
+                    break
+
+    # Construct the URL of the uploaded file
+    if isinstance(uploaded_file, dict) and "id" in uploaded_file:
+        directus_image_url = f"{DIRECTUS_BASE_URL}/assets/{uploaded_file['id']}"
+        logger.debug(f"Successfully streamed image to Directus: {directus_image_url}")
+        return directus_image_url
+    else:
+        logger.error(f"Unexpected upload response format: {uploaded_file}")
+        raise Exception(f"Unexpected upload response format: {uploaded_file}")
 
 
 async def get_image_url_async(aspect_title: str, aspect_summary: str) -> str:
@@ -204,10 +278,11 @@ async def get_image_url_async(aspect_title: str, aspect_summary: str) -> str:
 
     try:
         # Add a timeout to prevent hanging on image generation or upload issues
+        timeout = cap_timeout(120.0)  # 2 minute timeout, or less near the job's deadline
         async_task = asyncio.create_task(
             _generate_and_upload_async(PROMPT, aspect_title, aspect_summary)
         )
-        return await asyncio.wait_for(async_task, timeout=120.0)  # 2 minute timeout
+        return await asyncio.wait_for(async_task, timeout=timeout)
 
     except asyncio.TimeoutError:
         logger.error(f"Image generation timed out for aspect: {aspect_title}")
@@ -247,3 +322,43 @@ async def _generate_and_upload_async(prompt: str, aspect_title: str, aspect_summ
 
     logger.info(f"Successfully processed image async for aspect: {aspect_title}")
     return directus_url
+
+
+def start_image_generation(aspect: Dict) -> "asyncio.Task[None]":
+    """
+    Start image generation for an aspect as a background task.
+
+    The task patches aspect["image_url"] in place once the image has been
+    generated and uploaded; until then the aspect carries an empty image_url.
+    Calls are bounded by the worker-wide "image" limiter.
+
+    Args:
+        aspect: Aspect response containing at least a title and description
+
+    Returns:
+        asyncio.Task: Task to be awaited with wait_for_images()
+    """
+    aspect["image_url"] = ""
+
+    async def _generate() -> None:
+        async with get_limiter("image"):
+            aspect["image_url"] = await get_image_url_async(aspect["title"], aspect["description"])
+
+    return asyncio.create_task(_generate())
+
+
+async def wait_for_images(tasks: List["asyncio.Task[None]"]) -> None:
+    """
+    Wait for background image tasks started with start_image_generation().
+
+    A failing task leaves its aspect with an empty image_url.
+
+    Args:
+        tasks: Tasks returned by start_image_generation()
+    """
+    if not tasks:
+        return
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error in background image generation: {result}")
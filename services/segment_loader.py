@@ -0,0 +1,151 @@
+from typing import Any, Dict, List, Tuple, Optional
+from dataclasses import field, dataclass
+
+from runpod import RunPodLogger
+from utils.tracing import span
+from utils.token_budget import get_token_counter
+from integrations.directus_client import iter_items_by_ids
+
+logger = RunPodLogger()
+
+
+@dataclass
+class SegmentCorpus:
+    """
+    Conversation segments of a run, flattened into lines for topic modeling.
+
+    The lines of all contextual transcripts are stored once; each segment's
+    transcript is a span of lines, so no second copy of the corpus is kept.
+    """
+
+    segment_2_transcript: Dict[int, str] = field(default_factory=dict)
+    doc_ids: List[str] = field(default_factory=list)
+    docs: List[str] = field(default_factory=list)
+    doc_spans: List[Tuple[int, int]] = field(default_factory=list)
+    token_count: int = 0
+    exceeds_token_budget: bool = False
+
+    def raw_doc(self, index: int) -> str:
+        start, end = self.doc_spans[index]
+        return "\n".join(self.docs[start:end])
+
+    def docs_with_ids(self) -> str:
+        return "---------\n\n".join(
+            [f"SEGMENT_ID_{doc_id}: {self.raw_doc(i)}" for i, doc_id in enumerate(self.doc_ids)]
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        # The fields are referenced, not copied; JSON object keys are strings
+        return {
+            "segment_2_transcript": list(self.segment_2_transcript.items()),
+            "doc_ids": self.doc_ids,
+            "docs": self.docs,
+            "doc_spans": self.doc_spans,
+            "token_count": self.token_count,
+            "exceeds_token_budget": self.exceeds_token_budget,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SegmentCorpus":
+        return cls(
+            segment_2_transcript={int(k): v for k, v in data["segment_2_transcript"]},
+            doc_ids=data["doc_ids"],
+            docs=data["docs"],
+            doc_spans=[tuple(span) for span in data["doc_spans"]],
+            token_count=data["token_count"],
+            exceeds_token_budget=data["exceeds_token_budget"],
+        )
+
+
+async def load_segment_corpus(
+    segment_ids: List[str], token_budget: int, chunk_size: Optional[int] = None
+) -> SegmentCorpus:
+    """
+    Stream the segments of a run from Directus and build the corpus in a single pass.
+
+    Segments are fetched in chunks of IDs; for each chunk the transcripts are
+    recorded, the contextual transcripts are split into lines and the lines are
+    token-counted in one batch. Counting stops once token_budget is reached.
+
+    Args:
+        segment_ids: Segment IDs to load
+        token_budget: Token count above which the corpus is too large for a single prompt
+        chunk_size: Segment IDs per request (default: DIRECTUS_ID_CHUNK_SIZE)
+
+    Returns:
+        SegmentCorpus: Loaded corpus
+
+    Raises:
+        ValueError: If a segment lacks an id, transcript or contextual transcript
+    """
+    token_counter = get_token_counter()
+    corpus = SegmentCorpus()
+
+    query = {
+        "filter": {"transcript": {"_nnull": True}},
+        "fields": ["id", "contextual_transcript", "transcript"],
+    }
+    async for chunk in iter_items_by_ids(
+        "conversation_segment", segment_ids, query, chunk_size=chunk_size
+    ):
+        chunk_start = len(corpus.docs)
+        for segment in chunk:
+            if not isinstance(segment, dict):
+                continue
+            if "id" in segment and "transcript" in segment:
+                corpus.segment_2_transcript[int(segment["id"])] = str(segment["transcript"])
+                corpus.doc_ids.append(str(segment["id"]))
+            else:
+                raise ValueError(f"Segment {segment} does not have an id or transcript")
+
+            if "contextual_transcript" in segment:
+                raw_doc = str(segment["contextual_transcript"])
+            else:
+                raise ValueError(f"Segment {segment} does not have a contextual transcript")
+
+            start = len(corpus.docs)
+            if raw_doc != "":
+                corpus.docs.extend(raw_doc.split("\n"))
+            corpus.doc_spans.append((start, len(corpus.docs)))
+
+        if not corpus.exceeds_token_budget:
+            with span("token_count"):
+                corpus.token_count += sum(token_counter.count_batch(corpus.docs[chunk_start:]))
+            corpus.exceeds_token_budget = corpus.token_count >= token_budget
+
+    logger.info(
+        f"Loaded {len(corpus.doc_ids)} segments ({len(corpus.docs)} lines, "
+        f"{'over' if corpus.exceeds_token_budget else 'within'} the token budget)"
+    )
+    return corpus
+
+
+async def load_segment_summaries(
+    segment_ids: List[str], chunk_size: Optional[int] = None
+) -> Tuple[Dict[int, str], List[Tuple[int, str]]]:
+    """
+    Stream segments with the summary of their conversation, for the fallback path.
+
+    Args:
+        segment_ids: Segment IDs to load
+        chunk_size: Segment IDs per request (default: DIRECTUS_ID_CHUNK_SIZE)
+
+    Returns:
+        Tuple: Contains:
+            - segment_2_transcript: Mapping of segment ID to transcript
+            - summaries: Unique (segment ID, conversation summary) pairs
+    """
+    segment_2_transcript: Dict[int, str] = {}
+    summaries = set()
+
+    query = {
+        "fields": ["id", "transcript", "conversation_id.summary"],
+    }
+    async for chunk in iter_items_by_ids(
+        "conversation_segment", segment_ids, query, chunk_size=chunk_size
+    ):
+        for summary in chunk:
+            segment_2_transcript[int(summary["id"])] = str(summary["transcript"])
+            summaries.add((summary["id"], summary["conversation_id"]["summary"]))
+
+    return segment_2_transcript, list(summaries)
@@ -1,8 +1,8 @@
 import os
 import random
-from typing import Dict, List
+import asyncio
+from typing import Dict, List, Optional
 
-import pandas as pd
 from runpod import RunPodLogger
 from prompts import (
     topic_model_user_prompt,
@@ -13,11 +13,17 @@ from prompts import (
     vanilla_topic_model_system_prompt,
 )
 from data_model import TopicModelResponse, ViewSummaryResponse
-from litellm.utils import token_counter
-from core.topic_modeling import initialize_topic_model, run_topic_model_hierarchical
+from utils.progress import ProgressCallback, emit_progress
+from utils.tracing import span
+from utils.checkpoint import JobCheckpoint, get_job_checkpoint
+from utils.concurrency import get_limiter
+from utils.token_budget import get_token_counter
+from core.topic_backend import get_topic_backend
 from integrations.azure_client import run_formated_llm_call_async
-from integrations.directus_client import update_directus, get_directus_client
+from integrations.directus_client import update_directus
 
+from services.image_generator import wait_for_images
+from services.segment_loader import SegmentCorpus, load_segment_corpus, load_segment_summaries
 from services.aspect_processor import get_aspect_response_list, fallback_get_aspect_response_list
 
 logger = RunPodLogger()
@@ -27,6 +33,7 @@ async def summarise_aspects(
     aspect_response_list: List[Dict],
     response_language: str = "en",
     user_prompt: str = "",
+    checkpoint: Optional[JobCheckpoint] = None,
 ):
     """
     Generate a summary of multiple aspects.
@@ -34,6 +41,8 @@ async def summarise_aspects(
     Args:
         aspect_response_list: List of aspect responses to summarize
         response_language: Language code for summary generation (default: 'en')
+        checkpoint: Optional job checkpoint; a generated summary is checkpointed as
+            "summary" and reused, the error summary returned on failure is not
 
     Returns:
         Dict: Summary response containing overview of all aspects
@@ -43,6 +52,10 @@ async def summarise_aspects(
     """
     if len(aspect_response_list) == 0:
         raise ValueError("No aspects to summarise")
+    if checkpoint is not None:
+        view_response = await checkpoint.load_async("summary")
+        if view_response is not None:
+            return view_response
     aspect_texts = [
         f"{aspect['title']}\n{aspect['description']}\n{aspect['summary']}"
         for aspect in aspect_response_list
@@ -61,7 +74,6 @@ async def summarise_aspects(
     ]
     try:
         view_response = await run_formated_llm_call_async(messages, ViewSummaryResponse)
-        return view_response
     except Exception as e:
         logger.error(f"Error in LLM call for view summary: {e}")
         # Return a minimal summary response
@@ -70,86 +82,37 @@ async def summarise_aspects(
             "description": f"Unable to generate view summary due to error: {str(e)}",
             "summary": "Summary generation failed",
         }
+    if checkpoint is not None:
+        await checkpoint.save_async("summary", view_response)
+    return view_response
 
 
-async def get_views_aspects(
-    segment_ids: List[str],
+async def get_tentative_aspects(
+    corpus: SegmentCorpus,
     user_prompt: str,
-    project_analysis_run_id: str,
-    response_language: str | None = None,
-    threshold_context_length: int = int(os.getenv("THRESHOLD_CONTEXT_LENGTH", 100000)),
-    user_input: str = "",
-    user_input_description: str = "",
-) -> Dict:
+    response_language: str,
+    threshold_context_length: int,
+    project_id: Optional[str] = None,
+) -> List[str]:
     """
-    Generate comprehensive views and aspects analysis for conversation segments.
-
-    This function performs the following steps:
-    1. Retrieves contextual transcripts for given segment IDs
-    2. Performs topic modeling using either direct LLM or BERTopic based on context length
-    3. Generates detailed aspect responses for each identified topic
-    4. Creates a summary of all aspects
+    Propose the aspects of a corpus, directly with the LLM if the corpus fits in
+    threshold_context_length tokens, else from BERTopic representative documents.
 
     Args:
-        segment_ids: List of segment IDs to analyze
+        corpus: Segments to analyze
         user_prompt: User's query or instruction for analysis
-        response_language: Language code for response generation (default: 'en')
-        context_length: Maximum token length for direct LLM processing (default: 100000)
+        response_language: Language code for response generation
+        threshold_context_length: Maximum token length for direct LLM processing
+        project_id: Optional project ID; enables reuse of the project's stored topic model
 
     Returns:
-        Dict: Contains:
-            - views: Summary of all aspects
-            - aspects: List of detailed aspect responses
-            - seed: Original user prompt
-            - language: Response language used
-    """
-    if response_language is None:
-        response_language = "en"
+        List[str]: Tentative aspect topics
 
-    segments = get_directus_client().get_items(
-        "conversation_segment",
-        {
-            "query": {
-                "filter": {"id": {"_in": segment_ids}, "transcript": {"_nnull": True}},
-                "fields": ["id", "contextual_transcript", "transcript"],
-                "limit": -1,
-            },
-        },
-    )
-    logger.debug(f"Retrieved segments: {segments}")
-    # Type-safe dictionary comprehension with explicit type checking
-    segment_2_transcript: Dict[int, str] = {}
-    raw_docs: List[str] = []
-    doc_ids: List[str] = []
-    for segment in segments:
-        if isinstance(segment, dict):
-            if "id" in segment and "transcript" in segment:
-                segment_2_transcript[int(segment["id"])] = str(segment["transcript"])
-                doc_ids.append(str(segment["id"]))
-            else:
-                raise ValueError(f"Segment {segment} does not have an id or transcript")
-
-            if "contextual_transcript" in segment:
-                raw_docs.append(str(segment["contextual_transcript"]))
-            else:
-                raise ValueError(f"Segment {segment} does not have a contextual transcript")
-
-    # Process docs with explicit type handling
-    split_docs: List[List[str]] = [doc.split("\n") for doc in raw_docs if doc != ""]
-    docs: List[str] = []
-
-    for sublist in split_docs:
-        docs.extend(sublist)
-
-    topic_model = initialize_topic_model()
-    token_length = 0
-    for doc in docs:
-        token_length += token_counter(model=str(os.getenv("AZURE_MODEL")), text=doc)
-
-    if token_length < threshold_context_length:
-        docs_with_ids = "---------\n\n".join(
-            [f"SEGMENT_ID_{doc_id}: {doc}" for doc_id, doc in zip(doc_ids, raw_docs)]
-        )
+    Raises:
+        Exception: If the topic modeling LLM call fails
+    """
+    if not corpus.exceeds_token_budget:
+        docs_with_ids = corpus.docs_with_ids()
         messages = [
             {"role": "system", "content": vanilla_topic_model_system_prompt},
             {
@@ -169,35 +132,16 @@ async def get_views_aspects(
             logger.error(f"Error in LLM call for topic modeling (vanilla path): {e}")
             raise e
     else:
-        topics, probs, hierarchical_topics = run_topic_model_hierarchical(topic_model, docs)
-        repr_docs_token_length = threshold_context_length * 1.1
-        nr_repr_docs = 100
-        while repr_docs_token_length > threshold_context_length * 0.8 and nr_repr_docs > 3:
-            doc_topic = pd.DataFrame(
-                {
-                    "Topic": topic_model.topics_,
-                    "ID": range(len(topic_model.topics_)),
-                    "Document": docs,
-                }
-            )
-            repr_docs, _, _, _ = topic_model._extract_representative_docs(
-                topic_model.c_tf_idf_,
-                doc_topic,
-                topic_model.topic_representations_,
-                nr_samples=1000,
-                nr_repr_docs=nr_repr_docs,
+        # Only the clustering branch loads the topic modeling stack. Fitting is
+        # CPU-bound, so it runs in a thread to keep other jobs on the worker responsive.
+        async with get_limiter("topic_model"):
+            representative_documents = await asyncio.to_thread(
+                lambda: get_topic_backend().representative_documents(
+                    corpus.docs,
+                    token_budget=int(threshold_context_length * 0.8),
+                    project_id=project_id,
+                )
             )
-            rep_doc_list = {k: v for k, v in repr_docs.items() if k != -1}
-            nl = "\n\n"
-            rep_docs_formatted = [
-                f"Document set {k} : \n {nl.join(v)}" for k, v in rep_doc_list.items()
-            ]
-            representative_documents = "\n\n\n\n\n\n".join(rep_docs_formatted)
-            repr_docs_token_length = token_counter(
-                model=str(os.getenv("AZURE_MODEL")),
-                text=representative_documents,
-            )
-            nr_repr_docs = round(nr_repr_docs * 0.75)
         messages = [
             {"role": "system", "content": topic_model_system_prompt},
             {
@@ -217,26 +161,104 @@ async def get_views_aspects(
             logger.error(f"Error in LLM call for topic modeling: {e}")
             raise e
 
-    tentative_aspects = tentative_aspects_response["topics"]
+    return tentative_aspects_response["topics"]
+
+
+async def get_views_aspects(
+    segment_ids: List[str],
+    user_prompt: str,
+    project_analysis_run_id: str,
+    response_language: str | None = None,
+    threshold_context_length: int = int(os.getenv("THRESHOLD_CONTEXT_LENGTH", 100000)),
+    user_input: str = "",
+    user_input_description: str = "",
+    project_id: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict:
+    """
+    Generate comprehensive views and aspects analysis for conversation segments.
+
+    This function performs the following steps:
+    1. Retrieves contextual transcripts for given segment IDs
+    2. Performs topic modeling using either direct LLM or BERTopic based on context length
+    3. Generates detailed aspect responses for each identified topic
+    4. Creates a summary of all aspects
+
+    Every successful step is checkpointed under project_analysis_run_id, so a
+    retried job resumes from the last completed step; the checkpoints are removed
+    once the results are written to Directus.
+
+    Args:
+        segment_ids: List of segment IDs to analyze
+        user_prompt: User's query or instruction for analysis
+        response_language: Language code for response generation (default: 'en')
+        context_length: Maximum token length for direct LLM processing (default: 100000)
+        project_id: Optional project ID; enables reuse of the project's stored topic model
+        progress: Optional callback receiving an event per completed stage:
+            "segments_loaded", "tentative_aspects", "aspect_completed" and
+            "aspect_image" (per aspect), "summary" and "persisted"
+
+    Returns:
+        Dict: Contains:
+            - views: Summary of all aspects
+            - aspects: List of detailed aspect responses
+            - seed: Original user prompt
+            - language: Response language used
+    """
+    if response_language is None:
+        response_language = "en"
+
+    checkpoint = get_job_checkpoint(project_analysis_run_id, "views")
+    corpus_data = await checkpoint.load_async("segments")
+    if corpus_data is not None:
+        corpus = SegmentCorpus.from_dict(corpus_data)
+    else:
+        with span("stage.segments", segments=len(segment_ids)):
+            corpus = await load_segment_corpus(segment_ids, threshold_context_length)
+        await checkpoint.save_async("segments", corpus.to_dict())
+    segment_2_transcript = corpus.segment_2_transcript
+    emit_progress(progress, "segments_loaded", segment_count=len(segment_2_transcript))
+
+    tentative_aspects = await checkpoint.load_async("tentative_aspects")
+    if tentative_aspects is None:
+        with span("stage.tentative_aspects", clustering=corpus.exceeds_token_budget):
+            tentative_aspects = await get_tentative_aspects(
+                corpus, user_prompt, response_language, threshold_context_length, project_id
+            )
+        await checkpoint.save_async("tentative_aspects", tentative_aspects)
     logger.info(f"Tentative aspects: {tentative_aspects}")
-    aspect_response_list = await get_aspect_response_list(
-        tentative_aspects,
-        segment_ids,
-        segment_2_transcript,
-        response_language=response_language,
-    )
-    views_dict = await summarise_aspects(
-        aspect_response_list,
-        response_language=response_language,
-        user_prompt=user_prompt,
-    )
+    emit_progress(progress, "tentative_aspects", aspects=tentative_aspects)
+    # Images are generated in the background and joined right before persisting
+    image_tasks: List[asyncio.Task] = []
+    with span("stage.aspects", aspects=len(tentative_aspects)):
+        aspect_response_list = await get_aspect_response_list(
+            tentative_aspects,
+            segment_ids,
+            segment_2_transcript,
+            response_language=response_language,
+            image_tasks=image_tasks,
+            checkpoint=checkpoint,
+            progress=progress,
+        )
+    with span("stage.summary"):
+        views_dict = await summarise_aspects(
+            aspect_response_list,
+            response_language=response_language,
+            user_prompt=user_prompt,
+            checkpoint=checkpoint,
+        )
+    emit_progress(progress, "summary", summary=views_dict)
+    with span("stage.images"):
+        await wait_for_images(image_tasks)
     views_dict["aspects"] = aspect_response_list
     views_dict["seed"] = user_prompt
     views_dict["language"] = response_language
     views_dict["user_input"] = user_input
     views_dict["user_input_description"] = user_input_description
     response = {"view": views_dict}
-    update_directus(response, project_analysis_run_id)
+    await asyncio.to_thread(update_directus, response, project_analysis_run_id, checkpoint)
+    await checkpoint.clear_async()
+    emit_progress(progress, "persisted", project_analysis_run_id=project_analysis_run_id)
     return response
 
 
@@ -248,34 +270,38 @@ async def get_views_aspects_fallback(
     threshold_context_length: int = int(os.getenv("THRESHOLD_CONTEXT_LENGTH", 100000)),
     user_input: str = "",
     user_input_description: str = "",
+    progress: Optional[ProgressCallback] = None,
 ) -> Dict:
-    summaries = get_directus_client().get_items(
-        "conversation_segment",
-        {
-            "query": {
-                "filter": {"id": {"_in": segment_ids}},
-                "fields": ["id", "transcript", "conversation_id.summary"],
+    checkpoint = get_job_checkpoint(project_analysis_run_id, "fallback")
+    segments = await checkpoint.load_async("segments")
+    if segments is not None:
+        segment_2_transcript = {int(k): v for k, v in segments["segment_2_transcript"]}
+        samples_to_summarise = [tuple(sample) for sample in segments["samples_to_summarise"]]
+    else:
+        with span("stage.segments", segments=len(segment_ids)):
+            segment_2_transcript, summaries_list = await load_segment_summaries(segment_ids)
+        random.shuffle(summaries_list)
+        token_budget = threshold_context_length * 0.8
+        # Summaries past the budget are never tokenized
+        summary_token_counts = get_token_counter().count_until(
+            [str(summary[1]) for summary in summaries_list], token_budget
+        )
+        samples_to_summarise = []
+        token_count = 0
+        for summary, summary_token_count in zip(summaries_list, summary_token_counts):
+            if token_count + summary_token_count > token_budget:
+                break
+            samples_to_summarise.append(summary)
+            token_count += summary_token_count
+        await checkpoint.save_async(
+            "segments",
+            {
+                "segment_2_transcript": list(segment_2_transcript.items()),
+                "samples_to_summarise": samples_to_summarise,
             },
-        },
-    )
-    logger.debug(f"Retrieved summaries: {summaries}")
-    segment_2_transcript: Dict[int, str] = {}
-    for summary in summaries:
-        segment_2_transcript[int(summary["id"])] = str(summary["transcript"])
-    summaries_list = list(
-        set([(summary["id"], summary["conversation_id"]["summary"]) for summary in summaries])
-    )
-    random.shuffle(summaries_list)
-    samples_to_summarise = []
-    token_count = 0
-    for summary in summaries_list:
-        if (
-            token_count + token_counter(model=str(os.getenv("AZURE_MODEL")), text=summary[1])
-            > threshold_context_length * 0.8
-        ):
-            break
-        samples_to_summarise.append(summary)
-        token_count += token_counter(model=str(os.getenv("AZURE_MODEL")), text=summary[1])
+        )
+
+    emit_progress(progress, "segments_loaded", segment_count=len(segment_2_transcript))
 
     # Do the vanilla path
     docs_with_ids = "---------\n\n".join(
@@ -292,30 +318,50 @@ async def get_views_aspects_fallback(
             ),
         },
     ]
-    try:
-        tentative_aspects_response = await run_formated_llm_call_async(messages, TopicModelResponse)
-    except Exception as e:
-        logger.error(f"Error in LLM call for topic modeling (fallback path): {e}")
-        # Create a fallback response
-        tentative_aspects_response = {"topics": ["General Discussion", "Key Points", "Main Themes"]}
-    tentative_aspects = tentative_aspects_response["topics"]
-    aspect_response_list = await fallback_get_aspect_response_list(
-        tentative_aspects,
-        docs_with_ids,
-        user_prompt,
-        segment_2_transcript,
-        response_language=response_language,
-    )
-    views_dict = await summarise_aspects(
-        aspect_response_list,
-        response_language=response_language,
-        user_prompt=user_prompt,
-    )
+    tentative_aspects = await checkpoint.load_async("tentative_aspects")
+    if tentative_aspects is None:
+        try:
+            with span("stage.tentative_aspects"):
+                tentative_aspects_response = await run_formated_llm_call_async(
+                    messages, TopicModelResponse
+                )
+        except Exception as e:
+            logger.error(f"Error in LLM call for topic modeling (fallback path): {e}")
+            # Generic topics, not checkpointed so that a retried job asks the LLM again
+            tentative_aspects = ["General Discussion", "Key Points", "Main Themes"]
+        else:
+            tentative_aspects = tentative_aspects_response["topics"]
+            await checkpoint.save_async("tentative_aspects", tentative_aspects)
+    emit_progress(progress, "tentative_aspects", aspects=tentative_aspects)
+    image_tasks: List[asyncio.Task] = []
+    with span("stage.aspects", aspects=len(tentative_aspects)):
+        aspect_response_list = await fallback_get_aspect_response_list(
+            tentative_aspects,
+            docs_with_ids,
+            user_prompt,
+            segment_2_transcript,
+            response_language=response_language,
+            image_tasks=image_tasks,
+            checkpoint=checkpoint,
+            progress=progress,
+        )
+    with span("stage.summary"):
+        views_dict = await summarise_aspects(
+            aspect_response_list,
+            response_language=response_language,
+            user_prompt=user_prompt,
+            checkpoint=checkpoint,
+        )
+    emit_progress(progress, "summary", summary=views_dict)
+    with span("stage.images"):
+        await wait_for_images(image_tasks)
     views_dict["aspects"] = aspect_response_list
     views_dict["seed"] = user_prompt
     views_dict["language"] = response_language
     views_dict["user_input"] = user_input
     views_dict["user_input_description"] = user_input_description
     response = {"view": views_dict}
-    update_directus(response, project_analysis_run_id)
+    await asyncio.to_thread(update_directus, response, project_analysis_run_id, checkpoint)
+    await checkpoint.clear_async()
+    emit_progress(progress, "persisted", project_analysis_run_id=project_analysis_run_id)
     return response
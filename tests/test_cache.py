@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from utils.cache import AsyncTTLCache
+
+
+class AsyncTTLCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_compute(self):
+        cache = AsyncTTLCache()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(*[cache.get_or_compute("key", compute) for _ in range(5)])
+
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(calls, 1)
+
+    async def test_cancelling_the_owner_does_not_cancel_waiters(self):
+        cache = AsyncTTLCache()
+        started = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.05)
+            return "value"
+
+        owner = asyncio.create_task(cache.get_or_compute("key", compute))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        owner.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await owner
+
+        # The waiter takes the call over instead of failing with the owner
+        self.assertEqual(await waiter, "value")
+        self.assertEqual(calls, 2)
+        self.assertEqual(cache.get("key"), "value")
+
+    async def test_failures_are_not_cached(self):
+        cache = AsyncTTLCache()
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def succeed():
+            return "value"
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_compute("key", fail)
+        self.assertEqual(await cache.get_or_compute("key", succeed), "value")
+
+    async def test_rejected_values_are_not_cached(self):
+        cache = AsyncTTLCache()
+
+        async def compute():
+            return "short"
+
+        value = await cache.get_or_compute("key", compute, should_cache=lambda v: len(v) > 10)
+
+        self.assertEqual(value, "short")
+        self.assertIsNone(cache.get("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
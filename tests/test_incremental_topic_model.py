@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+import core.incremental_topic_model as itm
+from core.warmup import _synthetic_corpus
+
+try:
+    import torch
+
+    _has_torch = hasattr(torch, "from_numpy")
+except ImportError:
+    _has_torch = False
+
+
+class IncrementalTopicModelTest(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.store_dir.cleanup)
+        patcher = mock.patch.dict(os.environ, {"TOPIC_MODEL_STORE_DIR": self.store_dir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @unittest.skipUnless(_has_torch, "saving with safetensors requires torch")
+    def test_saved_model_is_reused_without_refitting(self):
+        docs, embeddings = _synthetic_corpus(300, n_clusters=5, dim=16)
+        with mock.patch.object(itm, "get_embedding_model", return_value=None):
+            _, topics = itm.fit_project_topic_model("project", docs[:280], embeddings[:280])
+            self.assertIsNotNone(itm._load("project"))
+
+            with mock.patch.object(itm, "_refit", side_effect=AssertionError("refitted")):
+                _, reused_topics = itm.fit_project_topic_model("project", docs, embeddings)
+
+        self.assertEqual(reused_topics[:280], topics)
+        self.assertEqual(len(reused_topics), 300)
+
+    def test_failed_save_removes_the_model_directory(self):
+        def save(path, **kwargs):
+            os.makedirs(path)
+            raise TypeError("not serializable")
+
+        topic_model = SimpleNamespace(
+            vectorizer_model=SimpleNamespace(vocabulary_={"word": np.int64(0)}), save=save
+        )
+        os.makedirs(itm._project_dir("project"))
+
+        with self.assertRaises(TypeError):
+            itm._save("project", topic_model, {})
+
+        self.assertEqual(os.listdir(itm._project_dir("project")), [])
+        self.assertIs(type(topic_model.vectorizer_model.vocabulary_["word"]), int)
+
+    def test_outlier_only_model_assigns_everything_to_outliers(self):
+        topic_model = SimpleNamespace(
+            topic_representations_={-1: []}, topic_embeddings_=np.ones((1, 4))
+        )
+
+        topics, similarities = itm._assign_to_topics(topic_model, np.ones((3, 4)))
+
+        self.assertEqual(topics.tolist(), [-1, -1, -1])
+        self.assertEqual(similarities.tolist(), [0, 0, 0])
@@ -0,0 +1,26 @@
+import json
+import unittest
+
+from services.segment_loader import SegmentCorpus
+
+
+class SegmentCorpusTest(unittest.TestCase):
+    def test_round_trips_through_json(self):
+        corpus = SegmentCorpus(
+            segment_2_transcript={1: "a", 2: "b"},
+            doc_ids=["1", "2"],
+            docs=["x", "y", "z"],
+            doc_spans=[(0, 1), (1, 3)],
+            token_count=10,
+            exceeds_token_budget=False,
+        )
+
+        restored = SegmentCorpus.from_dict(json.loads(json.dumps(corpus.to_dict())))
+
+        self.assertEqual(restored, corpus)
+        self.assertEqual(restored.raw_doc(1), "y\nz")
+
+    def test_to_dict_does_not_copy_the_lines(self):
+        corpus = SegmentCorpus(docs=["x"] * 3)
+
+        self.assertIs(corpus.to_dict()["docs"], corpus.docs)
@@ -0,0 +1,32 @@
+import os
+import unittest
+
+from litellm import token_counter
+
+from utils.token_budget import TokenCounter
+
+TEXTS = [
+    "What did participants say about public transport?",
+    "Ünïcödé — naïve café 東京 🙂",
+    "def f(x):\n    return x ** 2  # code",
+    "   leading spaces\n\n\ttabs and newlines  ",
+    "",
+]
+
+
+class TokenCounterTest(unittest.TestCase):
+    def assert_matches_litellm(self, model: str):
+        counts = TokenCounter(model).count_batch(TEXTS)
+
+        self.assertEqual(counts, [token_counter(model=model, text=text) for text in TEXTS])
+
+    def test_counts_match_litellm_for_the_configured_model(self):
+        self.assert_matches_litellm(os.getenv("AZURE_MODEL", "gpt-4"))
+
+    def test_counts_match_litellm_for_gpt_4o(self):
+        self.assert_matches_litellm("gpt-4o")
+
+    def test_count_until_stops_after_the_batch_over_budget(self):
+        counts = TokenCounter("gpt-4").count_until(["one two three"] * 10, budget=5, batch_size=2)
+
+        self.assertEqual(len(counts), 2)
@@ -1,5 +1,13 @@
 # Backward compatibility imports - main entry points
-from services.view_processor import get_views_aspects, get_views_aspects_fallback
-
 # Export the main functions that are used by handler.py
 __all__ = ["get_views_aspects", "get_views_aspects_fallback"]
+
+
+def __getattr__(name):
+    # Resolved on first access: services.view_processor itself imports utils
+    # submodules, so importing it eagerly here would make the imports circular
+    if name in __all__:
+        from services import view_processor
+
+        return getattr(view_processor, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
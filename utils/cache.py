@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Tuple, Callable, Iterator, Optional, Awaitable
+
+from runpod import RunPodLogger
+
+logger = RunPodLogger()
+
+_MISSING = object()
+
+
+class _OwnerCancelled(Exception):
+    """
+    Set on a shared in-flight call whose caller was cancelled. The other callers
+    waiting on it treat it as a miss and compute the value themselves.
+    """
+
+
+class SQLiteCacheBackend:
+    """
+    Disk backend of AsyncTTLCache: JSON values with an expiry time in a SQLite table.
+
+    Safe to share between threads and between processes on the same volume.
+    When max_entries is set, the entries closest to expiry are evicted first.
+
+    Args:
+        path: Path of the SQLite database file
+        max_entries: Optional maximum number of entries kept on disk
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, key: str) -> Tuple[Any, float]:
+        """
+        Return (value, expires_at) for a key, or (_MISSING, 0) if absent or expired.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING, 0.0
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            if self.max_entries is not None:
+                connection.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+
+class AsyncTTLCache:
+    """
+    In-memory LRU cache with a time to live, for the results of async calls.
+
+    Concurrent get_or_compute calls for the same key share a single in-flight
+    call. Failed calls are not cached. With a disk backend, entries also survive
+    worker restarts and are shared between workers; values must then be
+    JSON-serialisable. get_or_compute runs the backend's I/O in a worker thread,
+    while get and set block on it.
+
+    Args:
+        max_entries: Maximum number of entries kept in memory
+        ttl: Seconds an entry stays valid
+        backend: Optional disk backend consulted on memory misses
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl: float = 3600, backend: Optional[SQLiteCacheBackend] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[int, str], asyncio.Future] = {}
+        # Guards the dicts only, never held across an await
+        self._lock = threading.Lock()
+
+    def _get_memory(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _set_memory(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_backend(self, key: str) -> Any:
+        if self.backend is None:
+            return _MISSING
+        try:
+            value, expires_at = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Cache backend read failed: {e}")
+            return _MISSING
+        if value is not _MISSING:
+            self._set_memory(key, value, expires_at)
+        return value
+
+    def _set_backend(self, key: str, value: Any, expires_at: float) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(key, value, expires_at)
+        except Exception as e:
+            logger.error(f"Cache backend write failed: {e}")
+
+    async def _get_backend_async(self, key: str) -> Any:
+        if self.backend is None:
+            return _MISSING
+        return await asyncio.to_thread(self._get_backend, key)
+
+    async def _set_async(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, value, expires_at)
+        if self.backend is not None:
+            await asyncio.to_thread(self._set_backend, key, value, expires_at)
+
+    def get(self, key: str) -> Any:
+        """
+        Return the cached value for a key, or None if there is none.
+        """
+        value = self._get_memory(key)
+        if value is _MISSING:
+            value = self._get_backend(key)
+        return None if value is _MISSING else value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, value, expires_at)
+        self._set_backend(key, value, expires_at)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        should_cache: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Return the cached value for a key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key
+            compute: Coroutine function producing the value
+            should_cache: Optional predicate; computed values it rejects are
+                returned (also to concurrent callers) but not stored
+
+        Returns:
+            Any: Cached or freshly computed value
+
+        Raises:
+            Exception: Whatever compute raises; the failure is not cached
+        """
+        value = self._get_memory(key)
+        if value is not _MISSING:
+            return value
+
+        # Futures belong to an event loop, so calls are only coalesced within a loop
+        in_flight_key = (id(asyncio.get_running_loop()), key)
+        while True:
+            with self._lock:
+                future = self._in_flight.get(in_flight_key)
+                owner = future is None
+                if owner:
+                    future = asyncio.get_running_loop().create_future()
+                    self._in_flight[in_flight_key] = future
+            if owner:
+                break
+            try:
+                return await asyncio.shield(future)
+            except _OwnerCancelled:
+                # The caller computing the value was cancelled, e.g. with its job;
+                # the next waiter takes the call over
+                continue
+
+        try:
+            value = await self._get_backend_async(key)
+            if value is _MISSING:
+                value = await compute()
+                if should_cache is None or should_cache(value):
+                    await self._set_async(key, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Cancelling one caller must not cancel the others waiting on its call
+            self._fail_in_flight(in_flight_key, future, _OwnerCancelled())
+            raise
+        except Exception as e:
+            self._fail_in_flight(in_flight_key, future, e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(in_flight_key, None)
+
+    def _fail_in_flight(
+        self, in_flight_key: Tuple[int, str], future: asyncio.Future, exc: BaseException
+    ) -> None:
+        # Drop the entry first, so that waiters retrying after the failure start a new call
+        with self._lock:
+            self._in_flight.pop(in_flight_key, None)
+        future.set_exception(exc)
+        # Mark the exception as retrieved when no other caller is waiting
+        future.exception()
@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from runpod import RunPodLogger
+from utils.helpers import default_storage_path
+
+logger = RunPodLogger()
+
+
+class CheckpointStore(ABC):
+    """
+    Interface of a store of job checkpoints: JSON-serialisable values per
+    (job key, stage). Implementations must be safe to use from several threads.
+    """
+
+    @abstractmethod
+    def load(self, key: str, stage: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def save(self, key: str, stage: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self, key: str) -> None:
+        ...
+
+
+class LocalCheckpointStore(CheckpointStore):
+    """
+    Checkpoint store on the local filesystem: one JSON file per stage in one
+    directory per job. Writes are atomic; checkpoints older than ttl seconds are
+    ignored.
+
+    Args:
+        directory: Root directory of the checkpoints
+        ttl: Seconds a checkpoint stays valid
+    """
+
+    def __init__(self, directory: str, ttl: float = 24 * 3600):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _safe_name(name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+
+    def _job_dir(self, key: str) -> str:
+        return os.path.join(self.directory, self._safe_name(key))
+
+    def _stage_path(self, key: str, stage: str) -> str:
+        return os.path.join(self._job_dir(key), f"{self._safe_name(stage)}.json")
+
+    def load(self, key: str, stage: str) -> Optional[Any]:
+        path = self._stage_path(key, stage)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, stage: str, value: Any) -> None:
+        path = self._stage_path(key, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+    def clear(self, key: str) -> None:
+        shutil.rmtree(self._job_dir(key), ignore_errors=True)
+
+
+class JobCheckpoint:
+    """
+    Stage checkpoints of one pipeline of a job.
+
+    Checkpointing is best effort: store errors are logged and never fail the
+    job. Without a store every stage is a miss and saving is a no-op. Async code
+    uses the *_async methods, which run the store's I/O in a worker thread.
+
+    Args:
+        store: Checkpoint store, or None to disable checkpointing
+        key: Job key, e.g. the project_analysis_run_id
+        pipeline: Name of the pipeline, namespacing its stages within the job
+    """
+
+    def __init__(self, store: Optional[CheckpointStore], key: str, pipeline: str):
+        self.store = store
+        self.key = key
+        self.pipeline = pipeline
+
+    def load(self, stage: str) -> Optional[Any]:
+        if self.store is None:
+            return None
+        try:
+            value = self.store.load(self.key, f"{self.pipeline}.{stage}")
+        except Exception as e:
+            logger.error(f"Failed to load checkpoint {self.pipeline}.{stage} of {self.key}: {e}")
+            return None
+        if value is not None:
+            logger.info(f"Resuming {self.key} from checkpoint {self.pipeline}.{stage}")
+        return value
+
+    def save(self, stage: str, value: Any) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.save(self.key, f"{self.pipeline}.{stage}", value)
+        except Exception as e:
+            logger.error(f"Failed to save checkpoint {self.pipeline}.{stage} of {self.key}: {e}")
+
+    def clear(self) -> None:
+        """
+        Remove every checkpoint of the job, for all pipelines.
+        """
+        if self.store is None:
+            return
+        try:
+            self.store.clear(self.key)
+        except Exception as e:
+            logger.error(f"Failed to clear checkpoints of {self.key}: {e}")
+
+    async def load_async(self, stage: str) -> Optional[Any]:
+        if self.store is None:
+            return None
+        return await asyncio.to_thread(self.load, stage)
+
+    async def save_async(self, stage: str, value: Any) -> None:
+        if self.store is None:
+            return
+        await asyncio.to_thread(self.save, stage, value)
+
+    async def clear_async(self) -> None:
+        if self.store is None:
+            return
+        await asyncio.to_thread(self.clear)
+
+
+_checkpoint_store: Optional[CheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def set_checkpoint_store(store: Optional[CheckpointStore]) -> None:
+    """
+    Plug in a custom checkpoint store, replacing the default local store.
+    """
+    global _checkpoint_store
+    with _checkpoint_store_lock:
+        _checkpoint_store = store
+
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """
+    Return the worker-wide checkpoint store, or None if checkpointing is disabled.
+
+    Configured with CHECKPOINT_ENABLED (default: true), CHECKPOINT_DIR (default:
+    the RunPod network volume if mounted, else ~/.cache) and CHECKPOINT_TTL in
+    seconds (default: 86400).
+    """
+    global _checkpoint_store
+    if os.getenv("CHECKPOINT_ENABLED", "true").lower() != "true":
+        return None
+
+    with _checkpoint_store_lock:
+        if _checkpoint_store is None:
+            directory = os.getenv("CHECKPOINT_DIR") or default_storage_path("checkpoints")
+            try:
+                _checkpoint_store = LocalCheckpointStore(
+                    directory, ttl=float(os.getenv("CHECKPOINT_TTL", 24 * 3600))
+                )
+            except OSError as e:
+                logger.error(f"Checkpoint store unavailable at {directory}: {e}")
+                return None
+        return _checkpoint_store
+
+
+def get_job_checkpoint(key: str, pipeline: str) -> JobCheckpoint:
+    """
+    Return the checkpoints of a job's pipeline in the worker-wide store.
+
+    Args:
+        key: Job key, e.g. the project_analysis_run_id
+        pipeline: Name of the pipeline
+    """
+    return JobCheckpoint(get_checkpoint_store(), key, pipeline)
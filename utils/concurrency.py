@@ -0,0 +1,146 @@
+import os
+import sys
+import asyncio
+import weakref
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from runpod import RunPodLogger
+
+logger = RunPodLogger()
+
+# Default in-flight limits per downstream service. Each can be overridden with
+# an environment variable named <NAME>_CONCURRENCY, e.g. RAG_CONCURRENCY=4.
+DEFAULT_LIMITS: Dict[str, int] = {
+    "aspect": 6,
+    "rag": 4,
+    "llm": 8,
+    "image": 3,
+    # CPU-bound topic model fits, run in worker threads
+    "topic_model": 1,
+}
+
+# Bounds of the number of jobs a worker runs at the same time
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", 4))
+MIN_CONCURRENT_JOBS = int(os.getenv("MIN_CONCURRENT_JOBS", 1))
+# Load above which the worker takes fewer jobs: 1-minute load average per CPU,
+# fraction of GPU memory allocated, and estimated prompt tokens of in-flight LLM calls
+JOB_CPU_LOAD_THRESHOLD = float(os.getenv("JOB_CPU_LOAD_THRESHOLD", 0.85))
+JOB_GPU_MEMORY_THRESHOLD = float(os.getenv("JOB_GPU_MEMORY_THRESHOLD", 0.8))
+JOB_LLM_TOKEN_THRESHOLD = int(os.getenv("JOB_LLM_TOKEN_THRESHOLD", 400000))
+
+# asyncio.Semaphore is bound to the event loop it is first used on, so limiters
+# are kept per loop and dropped together with it.
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_concurrency_limit(name: str) -> int:
+    """
+    Resolve the concurrency limit for a named downstream.
+
+    Args:
+        name: Limiter name, e.g. "rag", "llm" or "image"
+
+    Returns:
+        int: Configured limit (at least 1)
+    """
+    default = DEFAULT_LIMITS.get(name, 4)
+    return max(1, int(os.getenv(f"{name.upper()}_CONCURRENCY", default)))
+
+
+def get_limiter(name: str) -> asyncio.Semaphore:
+    """
+    Return the worker-wide semaphore bounding in-flight calls to a downstream.
+
+    All callers on the same event loop share the same semaphore, so the limit
+    holds across aspects and across jobs running on the same worker.
+
+    Args:
+        name: Limiter name, e.g. "rag", "llm" or "image"
+
+    Returns:
+        asyncio.Semaphore: Semaphore sized by get_concurrency_limit(name)
+    """
+    loop = asyncio.get_running_loop()
+    loop_limiters = _limiters.setdefault(loop, {})
+    if name not in loop_limiters:
+        loop_limiters[name] = asyncio.Semaphore(get_concurrency_limit(name))
+    return loop_limiters[name]
+
+
+_inflight_llm_tokens = 0
+_inflight_llm_tokens_lock = threading.Lock()
+
+
+@contextmanager
+def track_llm_tokens(n_tokens: int) -> Iterator[None]:
+    """
+    Count n_tokens as in flight to the LLM for the duration of the block.
+    """
+    global _inflight_llm_tokens
+    with _inflight_llm_tokens_lock:
+        _inflight_llm_tokens += n_tokens
+    try:
+        yield
+    finally:
+        with _inflight_llm_tokens_lock:
+            _inflight_llm_tokens -= n_tokens
+
+
+def get_inflight_llm_tokens() -> int:
+    return _inflight_llm_tokens
+
+
+def _cpu_load() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+def _gpu_memory_load() -> float:
+    # Only consulted once the clustering branch has imported torch
+    torch = sys.modules.get("torch")
+    if torch is None or not torch.cuda.is_available():
+        return 0.0
+    try:
+        total = torch.cuda.get_device_properties(0).total_memory
+        return torch.cuda.memory_allocated(0) / total
+    except Exception:
+        return 0.0
+
+
+def job_concurrency_modifier(current_concurrency: int) -> int:
+    """
+    RunPod concurrency_modifier: the number of jobs the worker accepts at once.
+
+    Jobs mostly wait on the RAG server, the LLM, image generation and Directus,
+    so the worker takes one more job per call, up to MAX_CONCURRENT_JOBS, while
+    CPU load, GPU memory and the tokens of in-flight LLM calls stay below their
+    thresholds, and one fewer job (down to MIN_CONCURRENT_JOBS) otherwise.
+
+    Args:
+        current_concurrency: Number of jobs the worker currently accepts
+
+    Returns:
+        int: Number of jobs to accept
+    """
+    cpu_load = _cpu_load()
+    gpu_load = _gpu_memory_load()
+    llm_tokens = get_inflight_llm_tokens()
+    overloaded = (
+        cpu_load > JOB_CPU_LOAD_THRESHOLD
+        or gpu_load > JOB_GPU_MEMORY_THRESHOLD
+        or llm_tokens > JOB_LLM_TOKEN_THRESHOLD
+    )
+    concurrency = current_concurrency - 1 if overloaded else current_concurrency + 1
+    concurrency = max(MIN_CONCURRENT_JOBS, min(MAX_CONCURRENT_JOBS, concurrency))
+    if concurrency != current_concurrency:
+        logger.info(
+            f"Job concurrency {current_concurrency} -> {concurrency} (cpu={cpu_load:.2f}, "
+            f"gpu={gpu_load:.2f}, llm_tokens={llm_tokens})"
+        )
+    return concurrency
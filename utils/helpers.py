@@ -1,5 +1,23 @@
+import os
 import uuid
 
+RUNPOD_VOLUME = "/runpod-volume"
+
 
 def generate_uuid() -> str:
     return str(uuid.uuid4())
+
+
+def default_storage_path(*parts: str) -> str:
+    """
+    Default location of state persisted by the worker (caches, checkpoints,
+    topic models): on the RunPod network volume when it is mounted, so that it
+    is shared between workers and survives restarts, else under
+    ~/.cache/topic_modeler.
+
+    Args:
+        *parts: Path components below the storage root, e.g. "checkpoints"
+    """
+    if os.path.isdir(RUNPOD_VOLUME):
+        return os.path.join(RUNPOD_VOLUME, *parts)
+    return os.path.join(os.path.expanduser("~/.cache/topic_modeler"), *parts)
@@ -0,0 +1,30 @@
+import copy
+from typing import Any, Dict, Callable, Optional
+
+from runpod import RunPodLogger
+
+logger = RunPodLogger()
+
+# Receives one event per completed pipeline stage, e.g.
+# {"stage": "aspect_completed", "index": 0, "aspect": {...}}
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def emit_progress(progress: Optional[ProgressCallback], stage: str, **payload: Any) -> None:
+    """
+    Report a completed stage to a progress callback, if there is one.
+
+    The payload is copied, so later changes to the pipeline's objects do not
+    alter events already reported. A failing callback is logged and ignored.
+
+    Args:
+        progress: Optional progress callback
+        stage: Name of the completed stage
+        **payload: Stage results sent along with the event
+    """
+    if progress is None:
+        return
+    try:
+        progress({"stage": stage, **copy.deepcopy(payload)})
+    except Exception as e:
+        logger.error(f"Progress callback failed for stage {stage}: {e}")
@@ -1,27 +1,314 @@
 import time
 import random
 import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import field, dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, List, Callable, Iterator, Optional
 
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
 
-def retry_with_backoff(
-    func, max_retries=3, initial_delay=2, backoff_factor=2, jitter=0.5, logger=None, *args, **kwargs
-):
-    delay = initial_delay
-    for attempt in range(1, max_retries + 1):
+# Programming errors; retrying cannot fix them. Malformed responses (ValueError,
+# KeyError) are retried, as the next response may well be valid.
+NON_RETRYABLE_EXCEPTIONS = (TypeError, AttributeError, NotImplementedError)
+
+
+def get_status_code(exc: BaseException) -> Optional[int]:
+    """
+    Return the HTTP status code carried by an exception from requests, aiohttp,
+    httpx or litellm, or None if it has none.
+    """
+    for attr in ("status_code", "status"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Return the delay in seconds requested by the Retry-After header of the
+    response carried by an exception, or None if there is none.
+    """
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("Retry-After")
+    except AttributeError:
+        return None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Classify an exception: HTTP errors are retried only for RETRYABLE_STATUS_CODES;
+    other errors are retried unless they are NON_RETRYABLE_EXCEPTIONS.
+    """
+    status = get_status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return not isinstance(exc, NON_RETRYABLE_EXCEPTIONS)
+
+
+class RetryBudget:
+    """
+    Retries and time left to a job, shared by every call made on its behalf.
+
+    Args:
+        max_retries: Total retries allowed across all calls (None: unlimited)
+        timeout: Seconds until the job's deadline (None: no deadline)
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, timeout: Optional[float] = None):
+        self.retries_left = max_retries
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self._lock = threading.Lock()
+
+    def remaining_time(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def try_spend(self, delay: float) -> bool:
+        """
+        Take one retry from the budget if one is left and sleeping delay seconds
+        still leaves time before the deadline.
+        """
+        remaining = self.remaining_time()
+        if remaining is not None and delay >= remaining:
+            return False
+        with self._lock:
+            if self.retries_left is None:
+                return True
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+
+_retry_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar(
+    "retry_budget", default=None
+)
+
+
+@contextmanager
+def retry_budget(
+    max_retries: Optional[int] = None, timeout: Optional[float] = None
+) -> Iterator[RetryBudget]:
+    """
+    Set the retry budget of the current job. Tasks and threads started inside
+    the block inherit it through the context.
+
+    Args:
+        max_retries: Total retries allowed across all calls (None: unlimited)
+        timeout: Seconds until the job's deadline (None: no deadline)
+    """
+    budget = RetryBudget(max_retries, timeout)
+    token = _retry_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _retry_budget.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left until the current job's deadline, or None without a deadline.
+    """
+    budget = _retry_budget.get()
+    return budget.remaining_time() if budget is not None else None
+
+
+def cap_timeout(timeout: Optional[float]) -> Optional[float]:
+    """
+    Cap the timeout of an outgoing call at the time left until the current
+    job's deadline, so that no call outlives the job.
+
+    Args:
+        timeout: Configured timeout in seconds (None: no timeout)
+
+    Returns:
+        Optional[float]: min(timeout, remaining_time()), or timeout without a deadline
+
+    Raises:
+        TimeoutError: If the job's deadline has already passed
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise TimeoutError("Job deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@dataclass
+class RetryEvent:
+    """
+    A retry decision, passed to the hooks registered with add_retry_hook().
+
+    outcome is "retry" when the call is retried after delay seconds, or
+    "give_up" when the exception is raised to the caller.
+    """
+
+    name: str
+    attempt: int
+    exception: BaseException
+    outcome: str
+    delay: float = 0.0
+
+
+_retry_hooks: List[Callable[[RetryEvent], None]] = []
+
+
+def add_retry_hook(hook: Callable[[RetryEvent], None]) -> None:
+    """
+    Register a callable invoked with a RetryEvent for every retry decision,
+    e.g. to count retries in metrics.
+    """
+    _retry_hooks.append(hook)
+
+
+def _emit(event: RetryEvent, logger=None) -> None:
+    for hook in _retry_hooks:
         try:
-            return func(*args, **kwargs)
+            hook(event)
         except Exception as e:
             if logger:
-                logger.info(f"Attempt {attempt} failed with error: {e}")
-            if attempt == max_retries:
+                logger.error(f"Retry hook failed: {e}")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed call.
+
+    Only exceptions accepted by retry_on are retried. Delays follow decorrelated
+    jitter (each delay is drawn between base_delay and three times the previous
+    one, capped at max_delay), unless the server asks for a longer delay with
+    Retry-After. Retries also stop when the job's RetryBudget runs out or its
+    deadline would pass during the wait.
+
+    Args:
+        max_attempts: Maximum number of attempts, including the first one
+        base_delay: Minimum delay between attempts in seconds
+        max_delay: Maximum delay between attempts in seconds
+        max_retry_after: Retry-After values above this many seconds are not waited for
+        retry_on: Predicate selecting the exceptions to retry
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 20.0
+    max_retry_after: float = 60.0
+    retry_on: Callable[[BaseException], bool] = field(default=is_retryable)
+
+    def next_delay(self, previous_delay: float, exc: BaseException) -> Optional[float]:
+        """
+        Delay before the next attempt, or None if the server asks for a longer
+        wait than max_retry_after.
+        """
+        upper = max(previous_delay, self.base_delay) * 3
+        delay = min(self.max_delay, random.uniform(self.base_delay, upper))
+        retry_after = get_retry_after(exc)
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    def _should_retry(
+        self, name: str, attempt: int, exc: Exception, previous_delay: float, logger=None
+    ) -> Optional[float]:
+        delay = None
+        if attempt < self.max_attempts and self.retry_on(exc):
+            delay = self.next_delay(previous_delay, exc)
+            budget = _retry_budget.get()
+            if delay is not None and budget is not None and not budget.try_spend(delay):
                 if logger:
-                    logger.error(f"All {max_retries} attempts failed. Raising exception.")
-                raise
-            sleep_time = delay + random.uniform(0, jitter)
+                    logger.info(f"{name}: job retry budget or deadline exhausted")
+                delay = None
+
+        if delay is None:
             if logger:
-                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
-            time.sleep(sleep_time)
-            delay *= backoff_factor
+                logger.error(f"{name}: attempt {attempt} failed with error: {exc}. Giving up.")
+            _emit(RetryEvent(name, attempt, exc, "give_up"), logger)
+            return None
+        if logger:
+            logger.info(
+                f"{name}: attempt {attempt} failed with error: {exc}. "
+                f"Retrying in {delay:.2f} seconds..."
+            )
+        _emit(RetryEvent(name, attempt, exc, "retry", delay), logger)
+        return delay
+
+    def call(self, func: Callable, *args, name: Optional[str] = None, logger=None, **kwargs) -> Any:
+        """
+        Call func(*args, **kwargs), retrying according to the policy. Sleeps
+        block the calling thread; use call_async from async code.
+        """
+        name = name or getattr(func, "__name__", "call")
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(name, attempt, e, delay, logger)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def call_async(
+        self, async_func: Callable, *args, name: Optional[str] = None, logger=None, **kwargs
+    ) -> Any:
+        """
+        Await async_func(*args, **kwargs), retrying according to the policy.
+        """
+        name = name or getattr(async_func, "__name__", "call")
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await async_func(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(name, attempt, e, delay, logger)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+
+def _policy_from_backoff(max_retries, initial_delay, backoff_factor, jitter) -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=max_retries,
+        base_delay=initial_delay,
+        max_delay=initial_delay * backoff_factor ** max(max_retries - 1, 1) + jitter,
+    )
+
+
+def retry_with_backoff(
+    func, max_retries=3, initial_delay=2, backoff_factor=2, jitter=0.5, logger=None, *args, **kwargs
+):
+    """
+    Call func with retries; see RetryPolicy. Kept for existing callers: the
+    delays start at initial_delay and are capped where the previous exponential
+    schedule ended.
+    """
+    policy = _policy_from_backoff(max_retries, initial_delay, backoff_factor, jitter)
+    return policy.call(func, *args, logger=logger, **kwargs)
 
 
 async def async_retry_with_backoff(
@@ -37,19 +324,5 @@ async def async_retry_with_backoff(
     """
     Async version of retry_with_backoff for async functions.
     """
-    delay = initial_delay
-    for attempt in range(1, max_retries + 1):
-        try:
-            return await async_func(*args, **kwargs)
-        except Exception as e:
-            if logger:
-                logger.info(f"Attempt {attempt} failed with error: {e}")
-            if attempt == max_retries:
-                if logger:
-                    logger.error(f"All {max_retries} attempts failed. Raising exception.")
-                raise
-            sleep_time = delay + random.uniform(0, jitter)
-            if logger:
-                logger.info(f"Retrying in {sleep_time:.2f} seconds...")
-            await asyncio.sleep(sleep_time)
-            delay *= backoff_factor
+    policy = _policy_from_backoff(max_retries, initial_delay, backoff_factor, jitter)
+    return await policy.call_async(async_func, *args, logger=logger, **kwargs)
@@ -0,0 +1,127 @@
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+# litellm ships the cl100k_base, o200k_base and p50k_base files and points
+# TIKTOKEN_CACHE_DIR at them on import, so workers never download an encoding
+import litellm  # noqa: F401
+import tiktoken
+from runpod import RunPodLogger
+
+logger = RunPodLogger()
+
+# Number of texts encoded per batch call
+TOKEN_BATCH_SIZE = int(os.getenv("TOKEN_BATCH_SIZE", 2048))
+# Threads used by tiktoken for batch encoding
+TOKEN_BATCH_THREADS = int(os.getenv("TOKEN_BATCH_THREADS", 8))
+# tiktoken encoding used to count tokens, e.g. "o200k_base"; resolved from the model name when unset
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING")
+
+
+class TokenCounter:
+    """
+    Token counter bound to the tiktoken encoding of a single model.
+
+    The encoding is TOKEN_ENCODING when set, otherwise tiktoken's encoding for
+    the model name (without a provider prefix such as "azure/"). Names tiktoken
+    does not know, such as Azure deployment names, get o200k_base when they
+    contain "gpt-4o" and cl100k_base otherwise. Texts are encoded in batches
+    instead of one call per text.
+
+    Args:
+        model: Model name, e.g. the value of AZURE_MODEL
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        if TOKEN_ENCODING:
+            self._encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        else:
+            self._encoding = self._resolve_encoding(model)
+        logger.debug(f"Resolved tokenizer for {model}: {self.name}")
+
+    @staticmethod
+    def _resolve_encoding(model: str) -> tiktoken.Encoding:
+        # Strip provider prefixes such as "azure/"
+        model_name = model.split("/")[-1]
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            if "gpt-4o" in model_name:
+                return tiktoken.get_encoding("o200k_base")
+            return tiktoken.get_encoding("cl100k_base")
+
+    @property
+    def name(self) -> str:
+        return self._encoding.name
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a single text.
+        """
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        """
+        Count the tokens of every text in one batched pass.
+
+        Args:
+            texts: Texts to count
+
+        Returns:
+            List[int]: Token count per text, in input order
+        """
+        counts: List[int] = []
+        for start in range(0, len(texts), TOKEN_BATCH_SIZE):
+            encoded = self._encoding.encode_ordinary_batch(
+                list(texts[start : start + TOKEN_BATCH_SIZE]), num_threads=TOKEN_BATCH_THREADS
+            )
+            counts.extend(len(tokens) for tokens in encoded)
+        return counts
+
+    def count_until(self, texts: Sequence[str], budget: float, batch_size: int = 256) -> List[int]:
+        """
+        Count the tokens of texts in order, in batches, and stop after the batch
+        in which their total exceeds the budget. Texts after that batch are not
+        tokenized.
+
+        Args:
+            texts: Texts to count
+            budget: Token budget
+            batch_size: Texts encoded per batch; smaller batches count less past the budget
+
+        Returns:
+            List[int]: Token count per counted text, in input order; shorter than
+                texts when the budget was exceeded
+        """
+        counts: List[int] = []
+        total = 0
+        for start in range(0, len(texts), batch_size):
+            batch_counts = self.count_batch(texts[start : start + batch_size])
+            counts.extend(batch_counts)
+            total += sum(batch_counts)
+            if total > budget:
+                break
+        return counts
+
+
+_token_counters: Dict[str, TokenCounter] = {}
+_token_counters_lock = threading.Lock()
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    Return the cached TokenCounter for a model.
+
+    Args:
+        model: Model name (default: AZURE_MODEL)
+
+    Returns:
+        TokenCounter: Counter whose tokenizer is resolved once per model
+    """
+    if model is None:
+        model = str(os.getenv("AZURE_MODEL"))
+    with _token_counters_lock:
+        if model not in _token_counters:
+            _token_counters[model] = TokenCounter(model)
+        return _token_counters[model]
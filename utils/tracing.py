@@ -0,0 +1,268 @@
+import os
+import time
+import uuid
+import inspect
+import threading
+import contextvars
+import functools
+from contextlib import contextmanager
+from dataclasses import field, dataclass
+from typing import Any, Dict, List, Callable, Iterator, Optional
+
+from runpod import RunPodLogger
+from utils.retry import RetryEvent, add_retry_hook
+
+logger = RunPodLogger()
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class JobTrace:
+    """
+    Spans and counters recorded for one job.
+
+    Spans from every task and thread of the job are collected here; counters
+    accumulate values such as LLM token usage and retries.
+
+    Args:
+        trace_id: Identifier of the trace, e.g. the RunPod job ID
+    """
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.start = time.time()
+        self.spans: List[Span] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def add_counter(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarise the trace: total time, and per span name the number of spans
+        and their total and maximum duration in seconds, slowest first.
+        """
+        stages: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        for span in spans:
+            stage = stages.setdefault(span.name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            stage["count"] += 1
+            stage["total_s"] += span.duration
+            stage["max_s"] = max(stage["max_s"], span.duration)
+        for stage in stages.values():
+            stage["total_s"] = round(stage["total_s"], 3)
+            stage["max_s"] = round(stage["max_s"], 3)
+        return {
+            "trace_id": self.trace_id,
+            "total_s": round(time.time() - self.start, 3),
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["total_s"])),
+            "counters": counters,
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[JobTrace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def get_current_trace() -> Optional[JobTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None) -> Iterator[JobTrace]:
+    """
+    Record the spans of the current job. Tasks and threads started inside the
+    block record into the same trace. When TRACING_OTLP_ENABLED=true, the spans
+    are exported over OTLP when the block exits.
+
+    Args:
+        trace_id: Identifier of the trace, e.g. the RunPod job ID
+    """
+    trace = JobTrace(trace_id)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if os.getenv("TRACING_OTLP_ENABLED", "false").lower() == "true":
+            export_otlp(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a span of the current trace. Without an active trace the
+    block runs untraced and None is yielded.
+
+    Args:
+        name: Span name; spans with the same name are aggregated in the report
+        **attributes: Attributes recorded with the span
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent is not None else None,
+        start=time.time(),
+        attributes=dict(attributes),
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_attribute("error", repr(e))
+        raise
+    finally:
+        current.end = time.time()
+        _current_span.reset(token)
+        trace.add_span(current)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorator recording every call of a function, sync or async, as a span.
+
+    Args:
+        name: Span name (default: the function's qualified name)
+    """
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_counter(name: str, value: float = 1) -> None:
+    """
+    Add value to a counter of the current trace, if there is one.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_counter(name, value)
+
+
+def _count_retry(event: RetryEvent) -> None:
+    if event.outcome == "retry":
+        add_counter("retries")
+        add_counter(f"retries.{event.name}")
+    else:
+        add_counter("retry_give_ups")
+
+
+add_retry_hook(_count_retry)
+
+
+_otlp_tracer = None
+_otlp_tracer_lock = threading.Lock()
+
+
+def _get_otlp_tracer():
+    global _otlp_tracer
+    with _otlp_tracer_lock:
+        if _otlp_tracer is None:
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            # The endpoint is read from OTEL_EXPORTER_OTLP_ENDPOINT (default: a local collector)
+            provider = TracerProvider(
+                resource=Resource.create(
+                    {"service.name": os.getenv("OTEL_SERVICE_NAME", "topic-modeler")}
+                )
+            )
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            _otlp_tracer = provider.get_tracer(__name__)
+        return _otlp_tracer
+
+
+def export_otlp(trace: JobTrace) -> None:
+    """
+    Export the spans of a trace to an OpenTelemetry collector over OTLP/HTTP.
+
+    Requires opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http; when
+    they are not installed the trace is only reported in the logs.
+    """
+    try:
+        from opentelemetry import trace as otel_trace
+
+        tracer = _get_otlp_tracer()
+    except ImportError:
+        logger.error("TRACING_OTLP_ENABLED is set but opentelemetry is not installed")
+        return
+
+    def ns(seconds: float) -> int:
+        return int(seconds * 1e9)
+
+    try:
+        root = tracer.start_span(
+            "job", start_time=ns(trace.start), attributes={"job.trace_id": trace.trace_id}
+        )
+        otel_spans = {}
+        # Parents start before their children, so they are created first
+        for recorded in sorted(trace.spans, key=lambda s: s.start):
+            parent = otel_spans.get(recorded.parent_id, root)
+            otel_span = tracer.start_span(
+                recorded.name,
+                context=otel_trace.set_span_in_context(parent),
+                start_time=ns(recorded.start),
+                attributes={k: v for k, v in recorded.attributes.items() if v is not None},
+            )
+            otel_spans[recorded.span_id] = otel_span
+        for recorded in trace.spans:
+            otel_spans[recorded.span_id].end(end_time=ns(recorded.end or time.time()))
+        for counter, value in trace.counters.items():
+            root.set_attribute(f"job.{counter}", value)
+        root.end()
+    except Exception as e:
+        logger.error(f"Failed to export trace {trace.trace_id}: {e}")